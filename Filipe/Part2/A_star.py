@@ -1,87 +1,232 @@
-frontier = []
-explored_set = []
+import heapq
+from array import array
+
+from CostGrid import compile_grid
+from Observer import NULL_OBSERVER
 
 actions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
 
+INF = float('inf')
+
+
+# Outcome of one search: the path (None when the food is unreachable), its
+# energy cost, how many nodes were expanded and the final frontier/explored views
+class SearchResult():
+    def __init__(self, path, cost, expansions, frontier, explored):
+        self.path = path
+        self.cost = cost
+        self.expansions = expansions
+        self.frontier = frontier
+        self.explored = explored
 
-class Node():
-    def __init__(self, state, parent=None, energy_cost=0, heuristic_cost=0):
-        self.state = state
-        self.parent = parent
-        self.energy_cost = energy_cost + (parent.energy_cost if parent else 0)
-        self.heuristic_cost = heuristic_cost
-        self.cost = self.energy_cost + heuristic_cost
+    def found(self):
+        return self.path is not None
 
     def __str__(self):
-        return str(self.state)
+        return 'path={} cost={} expansions={}'.format(self.path, self.cost, self.expansions)
+
+
+# A* search that owns all of its state, so several searches can run at the
+# same time (threads, interleaved planners) over the same map. Each call to
+# run() starts from scratch and returns a SearchResult.
+#
+# The map can be given as a list of columns or as a CostGrid; compile it once
+# (CostGrid.compile_grid) and share it between all the searches over the same
+# map. Nodes are flat cell indices: the frontier holds (cost, order, index,
+# energy cost) tuples and the best energy cost, parent and closed flag of the
+# cells reached so far live in a dict and a set, so a query only pays for the
+# cells it touches, not for the size of the map. keep_views=False skips the
+# explored list and the frontier snapshot, for callers that only need the path.
+#
+# heuristic names an entry of the heuristics registry and weight multiplies
+# it (weighted A*: with an admissible heuristic the path costs at most weight
+# times the optimal cost, usually for far fewer expansions).
+class AStarSearch():
+
+    def __init__(self, map, observer=NULL_OBSERVER, keep_views=True, heuristic='manhattan', weight=1):
+        self.grid = compile_grid(map)
+        self.observer = observer
+        self.keep_views = keep_views
+        self.heuristic = heuristic
+        self.weight = weight
+        self.estimate = None
+        self.reset()
+
+    def reset(self):
+        # Frontier as a binary heap; stale entries are skipped lazily on pop
+        self.frontier = []
+        # Closed cells, in expansion order (read by the visualizer)
+        self.explored = array('i')
+        # Closed cells and the best known energy cost and parent of every reached cell
+        self.closed = set()
+        self.best_cost = {}
+        self.parent = {}
+        self.expansions = 0
+        # Insertion order, used to break cost ties in FIFO order (as the old stable sort did)
+        self.counter = 0
+
+    def run(self, agent_position, food_position):
+        self.reset()
+        grid = self.grid
+        observer = self.observer
+        observer.on_start(agent_position, food_position)
+        if not (grid.in_bounds(*agent_position) and grid.in_bounds(*food_position)):
+            observer.on_fail()
+            return self.result(None)
+
+        goal = grid.index(*food_position)
+        self.estimate = make_heuristic(self.heuristic, grid, food_position)
+        self.push_node(grid.index(*agent_position), 0, food_position)
+        while True:
+            index = self.pop_node()
+            if index is None:
+                observer.on_fail()
+                return self.result(None)
+            self.closed.add(index)
+            self.expansions += 1
+            if self.keep_views:
+                self.explored.append(index)
+            observer.on_expand(self, grid.position(index))
+            if index == goal:
+                observer.on_goal(self, food_position)
+                return self.result(index)
+
+            else:
+                self.expand_node(index, food_position)
+
+    # Pushes a node unless a cheaper path to its cell is already known (lazy decrease-key)
+    def push_node(self, index, energy_cost, food_position, parent=-1):
+        if energy_cost >= self.best_cost.get(index, INF):
+            return False
+        self.best_cost[index] = energy_cost
+        self.parent[index] = parent
+        self.counter += 1
+        cost = energy_cost + self.weight * self.estimate(index)
+        heapq.heappush(self.frontier, (cost, self.counter, index, energy_cost))
+        return True
+
+    # Pops the cheapest live node, discarding entries superseded by a cheaper push or already closed
+    def pop_node(self):
+        while self.frontier:
+            _, _, index, energy_cost = heapq.heappop(self.frontier)
+            if index not in self.closed and energy_cost == self.best_cost[index]:
+                return index
+        return None
+
+    def expand_node(self, index, food_position):
+        costs = self.grid.costs
+        closed = self.closed
+        energy_cost = self.best_cost[index]
+        for neighbor in self.grid.neighbors(index):
+            if neighbor not in closed and self.push_node(neighbor, energy_cost + costs[neighbor], food_position, index):
+                self.observer.on_push(self, self.grid.position(neighbor))
+
+    # Live frontier entries as (cost, state) pairs
+    def frontier_view(self):
+        position = self.grid.position
+        return [(cost, position(index)) for cost, _, index, energy_cost in self.frontier
+                if index not in self.closed and energy_cost == self.best_cost[index]]
+
+    def explored_view(self):
+        position = self.grid.position
+        return [position(index) for index in self.explored]
+
+    def solution(self, index):
+        solution_path = []
+        while index != -1:
+            solution_path.append(self.grid.position(index))
+            index = self.parent[index]
+        solution_path.reverse()
+        return solution_path
+
+    def result(self, index):
+        frontier = self.frontier_view() if self.keep_views else []
+        explored = self.explored_view() if self.keep_views else []
+        if index is None:
+            return SearchResult(None, None, self.expansions, frontier, explored)
+        return SearchResult(self.solution(index), self.best_cost[index], self.expansions, frontier, explored)
+
+
+# Searches a path from agent_position to food_position and returns the full
+# SearchResult. Progress is reported to the given observer (see Observer.py).
+# A list map is compiled for this call only: pass a CostGrid to keep the
+# tables built on it, like the ALT landmarks, between queries
+def plan(map, agent_position, food_position, observer=NULL_OBSERVER, keep_views=True,
+         heuristic='manhattan', weight=1):
+    return AStarSearch(map, observer, keep_views, heuristic, weight).run(agent_position, food_position)
+
+# Searches a path from agent_position to food_position and returns it as a list of states
+def search(map, agent_position, food_position, observer=NULL_OBSERVER, heuristic='manhattan', weight=1):
+    result = plan(map, agent_position, food_position, observer, heuristic=heuristic, weight=weight)
+    if not result.found():
+        raise Exception("Solucao nao encontrada")
+    return result.path
+
+# Planners selectable by name in plan_with
+PLANNERS = ('astar', 'hierarchical')
+
+# Searches with the named planner: 'astar' (plan) or 'hierarchical' (HPA*, see
+# Hierarchical.py), which pays off on large maps with wide uniform-cost regions.
+# The cluster graph is kept on the grid, so pass a CostGrid to build it only once
+def plan_with(planner, map, agent_position, food_position, observer=NULL_OBSERVER, cluster_size=16):
+    if planner == 'astar':
+        return plan(map, agent_position, food_position, observer)
+    if planner == 'hierarchical':
+        from Hierarchical import plan_hierarchical
+        return plan_hierarchical(compile_grid(map), agent_position, food_position, cluster_size)
+    raise ValueError('Unknown planner {}, expected one of {}'.format(planner, PLANNERS))
+
+# Answers the query from a DistanceFieldCache (see DistanceField.py): the first
+# query towards a food builds its distance field, later ones are table lookups
+def plan_cached(cache, agent_position, food_position):
+    field, built = cache.lookup(food_position)
+    expansions = field.settled if built else 0
+    if not field.reachable(agent_position):
+        return SearchResult(None, None, expansions, [], [])
+    return SearchResult(field.path(agent_position), field.distance(agent_position), expansions, [], [])
+
+def heuristic_cost(food_position, current_position):
+    return (abs(food_position[0] - current_position[0]) +
+            abs(food_position[1] - current_position[1]))
 
 
-def init_search():
-    global frontier
-    global explored_set
+# Heuristics registry: each entry builds, for a grid and a food position, a
+# function estimating the energy cost from a cell index to the food.
+#   manhattan         plain Manhattan distance (the original heuristic; it is
+#                     not admissible on 0-cost floors)
+#   scaled_manhattan  Manhattan distance times the cheapest floor cost (admissible)
+#   zero              no estimate at all (Dijkstra / uniform-cost search)
+#   alt               landmark (ALT) bounds from precomputed distance tables (admissible)
+heuristics = {}
 
-    explored_set = []
-    frontier = []
+def register_heuristic(name, factory):
+    heuristics[name] = factory
 
+def make_heuristic(name, grid, food_position):
+    if name not in heuristics:
+        raise ValueError('Unknown heuristic {}, expected one of {}'.format(name, sorted(heuristics)))
+    return heuristics[name](grid, food_position)
 
-def search(map, agent_position, food_position):
-    init_search()
-    frontier.append((0, Node(state=agent_position)))
-    rodada = 0
-    while True:    
-        node = frontier.pop(0)[1]
-        explored_set.append(node.state)
-        print("\n\nRodada " + str(rodada))
-        print("\nFronteira atual: " + str([(nodes[0], nodes[1].state) for nodes in frontier]))
-        print("\nNos ja visitados: " + str(explored_set))
-        rodada += 1
-        if goal_test(node, food_position):
-            return solution(node)
+def manhattan_heuristic(grid, food_position, scale=1):
+    height = grid.height
+    goal_x, goal_y = food_position
 
-        else:
-            expand_node(map, node, food_position)
-            if not frontier:
-                raise Exception("Solucao nao encontrada")
+    def estimate(index):
+        x, y = divmod(index, height)
+        return scale * (abs(goal_x - x) + abs(goal_y - y))
+    return estimate
 
-def heuristic_cost(food_position, current_position):
-    return (abs(food_position[0] - current_position[0]) +
-            abs(food_position[1] - current_position[1]))
+def scaled_manhattan_heuristic(grid, food_position):
+    return manhattan_heuristic(grid, food_position, grid.min_cost)
+
+def zero_heuristic(grid, food_position):
+    return lambda index: 0
+
+def alt_heuristic(grid, food_position):
+    from Landmarks import landmarks_for
+    return landmarks_for(grid).estimate_to(food_position)
 
-def energy_cost(map, current_position):
-    ground_cost = {
-               0: 0,
-               1: 999,
-               2: 5,
-               3: 10,
-               4: 20
-               }
-    return ground_cost[map[current_position[0]][current_position[1]]]
-    
-
-def goal_test(node, food_position):
-    return node.state == food_position
-
-def solution(node):
-    solution_path = []
-    while node:
-            solution_path.insert(0, node.state)
-            node = node.parent
-    return solution_path
-
-def expand_node(map, node, food_position):
-    global frontier
-    global explored_set
-
-    for action in actions:
-        state = (node.state[0] + action[0], node.state[1] + action[1])
-        if check_valid_node(state, map):
-            child_node = Node(state, node, energy_cost(map, state), heuristic_cost(food_position, state))
-            frontier.append((child_node.cost, child_node))
-    frontier = sorted(frontier, key=lambda x: x[0])
-
-def check_valid_node(state, map):
-    return (0<=state[0]<len(map) and 
-            0<=state[1]<len(map) and 
-            state not in explored_set and
-            state not in [node[1].state for node in frontier] and
-            map[state[0]][state[1]] != 1)
+register_heuristic('manhattan', manhattan_heuristic)
+register_heuristic('scaled_manhattan', scaled_manhattan_heuristic)
+register_heuristic('zero', zero_heuristic)
+register_heuristic('alt', alt_heuristic)
@@ -0,0 +1,61 @@
+# Batch path planning
+#
+# Answers many (start, goal) queries over the same map at once. The map is
+# compiled into a CostGrid a single time and shared by every search; when a
+# process pool is available the queries are split between worker processes,
+# each of which receives the grid only once, at start up.
+#
+# Processing (Jython) has no multiprocessing module, so there the queries are
+# answered in the calling thread.
+
+import A_star
+from CostGrid import compile_grid
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+# Cost grid of the current worker process (set by init_worker)
+worker_grid = None
+
+
+def init_worker(grid):
+    global worker_grid
+
+    worker_grid = grid
+
+
+# Answers one query in a worker. Only the path, cost and expansion count are
+# sent back; the frontier and explored views are not built
+def solve_query(query):
+    return A_star.plan(worker_grid, query[0], query[1], keep_views=False)
+
+
+# Returns one SearchResult per (start, goal) query, in the same order.
+# processes=None uses one worker per CPU; processes=1 runs in this process
+def batch_search(map, queries, processes=None, chunksize=None):
+    queries = list(queries)
+    grid = compile_grid(map)
+
+    if processes is None and multiprocessing is not None:
+        processes = multiprocessing.cpu_count()
+    if multiprocessing is None or processes is None or processes <= 1 or len(queries) < 2:
+        init_worker(grid)
+        return [solve_query(query) for query in queries]
+
+    processes = min(processes, len(queries))
+    if chunksize is None:
+        chunksize = max(1, len(queries) // (processes * 4))
+
+    pool = multiprocessing.Pool(processes, init_worker, (grid,))
+    try:
+        return pool.map(solve_query, queries, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+
+
+# Same as batch_search, but returns only the paths (None for unreachable goals)
+def batch_paths(map, queries, processes=None):
+    return [result.path for result in batch_search(map, queries, processes)]
@@ -0,0 +1,118 @@
+# Compiled cost grid for the path planners
+#
+# The map is a list of columns (map[x][y]) of floor types. A CostGrid is
+# built once from it: the energy cost of entering each cell is stored in a
+# flat array and the cells the agent can walk on in a byte mask, both indexed
+# by x * height + y. Maps do not need to be square.
+#
+# Flat arrays (instead of NumPy) keep the grid usable from Processing, whose
+# Jython has no NumPy; they are still compact enough for 1000x1000+ maps.
+
+from array import array
+
+# Floor types
+# 0: safe floor
+# 1: obstacle (agent cant pass through)
+# 2: sand
+# 3: mud
+# 4: water
+OBSTACLE = 1
+
+# Defines the cost for each type of floor
+GROUND_COST = {
+               0: 0,
+               1: 999,
+               2: 5,
+               3: 10,
+               4: 20
+               }
+
+
+class CostGrid():
+
+    def __init__(self, map, ground_cost=GROUND_COST, obstacles=(OBSTACLE,)):
+        self.width = len(map)
+        self.height = len(map[0]) if map else 0
+        self.ground_cost = dict(ground_cost)
+        self.obstacles = frozenset(obstacles)
+
+        self.floor = array('b')
+        self.costs = array('d')
+        self.passable = bytearray()
+        for x, column in enumerate(map):
+            if len(column) != self.height:
+                raise ValueError('Map column {} has {} cells, expected {}'.format(x, len(column), self.height))
+            for floor_type in column:
+                self.floor.append(floor_type)
+                self.costs.append(self.ground_cost[floor_type])
+                self.passable.append(0 if floor_type in self.obstacles else 1)
+
+        # Bumped whenever a cell changes, so caches built from the grid can tell they are stale
+        self.version = 0
+        # Tables other modules build from the grid (HPA* cluster graphs, ALT
+        # landmarks), by name; they live and die with the grid
+        self.tables = {}
+
+        # Cheapest cost of entering any walkable floor type (used by heuristics)
+        walkable = [cost for floor_type, cost in self.ground_cost.items() if floor_type not in self.obstacles]
+        self.min_cost = min(walkable) if walkable else 0
+
+    def __len__(self):
+        return self.width * self.height
+
+    def index(self, x, y):
+        return x * self.height + y
+
+    def position(self, index):
+        return divmod(index, self.height)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_passable(self, x, y):
+        return self.in_bounds(x, y) and self.passable[x * self.height + y] == 1
+
+    def cost(self, x, y):
+        return self.costs[x * self.height + y]
+
+    def floor_type(self, x, y):
+        return self.floor[x * self.height + y]
+
+    # Indices of the walkable cells next to index, in the order of A_star.actions:
+    # (-1, 0), (1, 0), (0, -1), (0, 1)
+    def neighbors(self, index):
+        height = self.height
+        passable = self.passable
+        y = index % height
+        result = []
+        if index >= height and passable[index - height]:
+            result.append(index - height)
+        if index + height < len(passable) and passable[index + height]:
+            result.append(index + height)
+        if y > 0 and passable[index - 1]:
+            result.append(index - 1)
+        if y < height - 1 and passable[index + 1]:
+            result.append(index + 1)
+        return result
+
+    # Changes the floor type of a cell and returns the old one
+    def set_floor(self, x, y, floor_type):
+        index = x * self.height + y
+        old_floor_type = self.floor[index]
+        self.floor[index] = floor_type
+        self.costs[index] = self.ground_cost[floor_type]
+        self.passable[index] = 0 if floor_type in self.obstacles else 1
+        self.version += 1
+        return old_floor_type
+
+    # Rebuilds the map as a list of columns of floor types
+    def to_map(self):
+        height = self.height
+        return [list(self.floor[x * height:(x + 1) * height]) for x in range(self.width)]
+
+
+# Returns map unchanged if it is already a CostGrid, otherwise compiles it
+def compile_grid(map, ground_cost=GROUND_COST):
+    if isinstance(map, CostGrid):
+        return map
+    return CostGrid(map, ground_cost)
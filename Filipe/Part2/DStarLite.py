@@ -0,0 +1,207 @@
+# Incremental replanning with D* Lite (Koenig and Likhachev, 2002)
+#
+# D* Lite searches backwards from the goal and keeps its search tree between
+# calls. When cell costs change (sand turning into water, a new obstacle...)
+# or the agent moves, only the nodes whose cost-to-goal is affected are
+# repaired, instead of running a new A* search from scratch.
+#
+#   planner = DStarLite(grid, agent_position, food_position)
+#   path = planner.plan()
+#   planner.move_to(path[3])
+#   planner.update_cells([(5, 7, 4), (5, 8, 1)])   # (x, y, new floor type)
+#   path = planner.plan()
+#
+# Moving into a cell costs the cell's ground cost; obstacle cells have no
+# incoming or outgoing moves. The heuristic is the Manhattan distance scaled by
+# the grid's cheapest floor cost, which stays admissible across edits.
+#
+# D* Lite needs every move to cost more than zero: on 0-cost floors two cells
+# can keep each other's stale cost-to-goal alive after an edit. So inside the
+# search a move costs ground cost * STEP_SCALE + 1, which ranks paths by
+# energy first and by number of moves second; cost() adds up the real ground
+# costs along the path.
+
+import heapq
+from array import array
+from collections import deque
+
+from A_star import SearchResult
+
+INF = float('inf')
+# Weight of the energy cost against the move count in the search costs (a
+# power of two, so scaling the ground costs is exact)
+STEP_SCALE = 2 ** 20
+
+
+class DStarLite():
+
+    def __init__(self, grid, agent_position, food_position):
+        self.grid = grid
+        self.start = grid.index(*agent_position)
+        self.goal = grid.index(*food_position)
+        self.last = self.start
+        self.km = 0
+        self.expansions = 0
+
+        size = len(grid)
+        self.g = array('d', [INF]) * size
+        self.rhs = array('d', [INF]) * size
+        # Open list as a heap with lazy deletion: an entry is live only while the
+        # cell is open and the entry's key matches the key recorded for it
+        self.open = []
+        self.in_open = bytearray(size)
+        self.open_key = [None] * size
+
+        self.rhs[self.goal] = 0
+        self.push(self.goal)
+
+    def heuristic(self, a, b):
+        ax, ay = divmod(a, self.grid.height)
+        bx, by = divmod(b, self.grid.height)
+        return (self.grid.min_cost * STEP_SCALE + 1) * (abs(ax - bx) + abs(ay - by))
+
+    # Cost of moving from cell u into the neighboring cell v
+    def step_cost(self, u, v):
+        passable = self.grid.passable
+        if not (passable[u] and passable[v]):
+            return INF
+        return self.grid.costs[v] * STEP_SCALE + 1
+
+    # In-bounds neighbors, walkable or not (walkability is part of the cost)
+    def around(self, index):
+        height = self.grid.height
+        size = len(self.g)
+        y = index % height
+        result = []
+        if index >= height:
+            result.append(index - height)
+        if index + height < size:
+            result.append(index + height)
+        if y > 0:
+            result.append(index - 1)
+        if y < height - 1:
+            result.append(index + 1)
+        return result
+
+    def calculate_key(self, index):
+        best = min(self.g[index], self.rhs[index])
+        return (best + self.heuristic(self.start, index) + self.km, best)
+
+    def push(self, index):
+        key = self.calculate_key(index)
+        self.in_open[index] = 1
+        self.open_key[index] = key
+        heapq.heappush(self.open, (key, index))
+
+    def top(self):
+        while self.open:
+            key, index = self.open[0]
+            if self.in_open[index] and self.open_key[index] == key:
+                return key, index
+            heapq.heappop(self.open)
+        return (INF, INF), None
+
+    def update_vertex(self, index):
+        if index != self.goal:
+            best = INF
+            for neighbor in self.around(index):
+                cost = self.step_cost(index, neighbor) + self.g[neighbor]
+                if cost < best:
+                    best = cost
+            self.rhs[index] = best
+        self.in_open[index] = 0
+        if self.g[index] != self.rhs[index]:
+            self.push(index)
+
+    def compute_shortest_path(self):
+        g = self.g
+        rhs = self.rhs
+        start = self.start
+        while True:
+            key, index = self.top()
+            if not (key < self.calculate_key(start) or rhs[start] != g[start]):
+                break
+            self.expansions += 1
+            new_key = self.calculate_key(index)
+            if key < new_key:
+                self.push(index)
+            elif g[index] > rhs[index]:
+                g[index] = rhs[index]
+                self.in_open[index] = 0
+                for neighbor in self.around(index):
+                    self.update_vertex(neighbor)
+            else:
+                g[index] = INF
+                self.update_vertex(index)
+                for neighbor in self.around(index):
+                    self.update_vertex(neighbor)
+
+    # Moves the agent; the next plan() reuses the search tree from the new position
+    def move_to(self, agent_position):
+        self.start = self.grid.index(*agent_position)
+
+    # Applies (x, y, floor_type) edits to the grid and repairs the affected nodes
+    def update_cells(self, edits):
+        self.km += self.heuristic(self.last, self.start)
+        self.last = self.start
+        changed = set()
+        for x, y, floor_type in edits:
+            self.grid.set_floor(x, y, floor_type)
+            index = self.grid.index(x, y)
+            changed.add(index)
+            changed.update(self.around(index))
+        for index in changed:
+            self.update_vertex(index)
+
+    # Energy cost of the cheapest path from the agent to the food (inf if unreachable)
+    def cost(self):
+        return self.path_cost(self.plan())
+
+    def path_cost(self, path):
+        if path is None:
+            return INF
+        return sum(self.grid.cost(x, y) for x, y in path[1:])
+
+    # Cheapest path from the agent to the food, both included (None if unreachable).
+    # From each cell the path may take any move that minimizes step cost + g.
+    # On 0-cost floors many neighbors tie and the ties can lead back, so the
+    # moves are followed breadth first instead of greedily.
+    def plan(self):
+        self.compute_shortest_path()
+        if self.g[self.start] == INF:
+            return None
+
+        parent = {self.start: None}
+        frontier = deque([self.start])
+        while frontier:
+            index = frontier.popleft()
+            if index == self.goal:
+                return self.walk_back(parent, index)
+            best, best_neighbors = INF, []
+            for neighbor in self.around(index):
+                cost = self.step_cost(index, neighbor) + self.g[neighbor]
+                if cost < best:
+                    best, best_neighbors = cost, [neighbor]
+                elif cost == best and cost != INF:
+                    best_neighbors.append(neighbor)
+            for neighbor in best_neighbors:
+                if neighbor not in parent:
+                    parent[neighbor] = index
+                    frontier.append(neighbor)
+        return None
+
+    def walk_back(self, parent, index):
+        position = self.grid.position
+        solution_path = []
+        while index is not None:
+            solution_path.append(position(index))
+            index = parent[index]
+        solution_path.reverse()
+        return solution_path
+
+    # Same answer as plan(), wrapped as an A_star.SearchResult (expansions are cumulative)
+    def result(self):
+        path = self.plan()
+        if path is None:
+            return SearchResult(None, None, self.expansions, [], [])
+        return SearchResult(path, self.path_cost(path), self.expansions, [], [])
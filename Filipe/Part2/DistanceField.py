@@ -0,0 +1,135 @@
+# Distance fields (reverse Dijkstra from a goal)
+#
+# A DistanceField runs a single Dijkstra search backwards from a goal cell of
+# a CostGrid and keeps, for every cell, the energy cost of the cheapest path
+# to the goal and the next cell on that path. Any number of start positions
+# can then be answered with table lookups, and a vehicle can follow the
+# gradient one cell at a time with next_step.
+#
+# DistanceFieldCache keeps the most recently used fields of a grid, keyed by
+# (grid version, goal), so re-planning towards the same food is free until
+# the grid costs change.
+
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+
+
+class DistanceField():
+
+    def __init__(self, grid, goal):
+        self.grid = grid
+        self.goal = goal
+        self.version = grid.version
+        size = len(grid)
+        self.distance_to_goal = array('d', [float('inf')]) * size
+        self.next_index = array('i', [-1]) * size
+        self.settled = 0
+        if grid.is_passable(*goal):
+            self.build(grid.index(*goal))
+
+    # Moving from a cell into its neighbor costs the neighbor's cost, so going
+    # backwards from v we relax every neighbor u with dist[v] + cost[v]
+    def build(self, goal):
+        costs = self.grid.costs
+        neighbors = self.grid.neighbors
+        distance = self.distance_to_goal
+        next_index = self.next_index
+        closed = bytearray(len(distance))
+
+        distance[goal] = 0
+        frontier = [(0, goal)]
+        while frontier:
+            d, v = heapq.heappop(frontier)
+            if closed[v]:
+                continue
+            closed[v] = 1
+            self.settled += 1
+            step = d + costs[v]
+            for u in neighbors(v):
+                if step < distance[u]:
+                    distance[u] = step
+                    next_index[u] = v
+                    heapq.heappush(frontier, (step, u))
+
+    def is_stale(self):
+        return self.version != self.grid.version
+
+    def reachable(self, position):
+        return self.grid.in_bounds(*position) and self.distance(position) != float('inf')
+
+    # Energy cost of the cheapest path from position to the goal (inf if unreachable)
+    def distance(self, position):
+        return self.distance_to_goal[self.grid.index(*position)]
+
+    # Next cell on a cheapest path from position to the goal (None at the goal or if unreachable)
+    def next_step(self, position):
+        index = self.next_index[self.grid.index(*position)]
+        if index == -1:
+            return None
+        return self.grid.position(index)
+
+    # Cheapest path from position to the goal, both included (None if unreachable)
+    def path(self, position):
+        if not self.reachable(position):
+            return None
+        grid = self.grid
+        index = grid.index(*position)
+        solution_path = [position]
+        while self.next_index[index] != -1:
+            index = self.next_index[index]
+            solution_path.append(grid.position(index))
+        return solution_path
+
+
+# Least recently used cache of the distance fields of one grid. It can be
+# shared between threads (the planner thread and the sketch, for instance)
+class DistanceFieldCache():
+
+    def __init__(self, grid, capacity=16):
+        self.grid = grid
+        self.capacity = capacity
+        self.fields = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the distance field towards goal, building it on a miss
+    def get(self, goal):
+        return self.lookup(goal)[0]
+
+    # Returns (field, built), where built tells whether this call had to build the field
+    def lookup(self, goal):
+        key = (self.grid.version, goal)
+        with self.lock:
+            field = self.fields.pop(key, None)
+            if field is not None:
+                self.hits += 1
+                self.fields[key] = field
+                return field, False
+            self.misses += 1
+
+        field = DistanceField(self.grid, goal)
+        with self.lock:
+            self.fields[key] = field
+            while len(self.fields) > self.capacity:
+                self.fields.popitem(last=False)
+        return field, True
+
+    # Drops the fields built for older versions of the grid
+    def prune(self):
+        with self.lock:
+            for key in list(self.fields):
+                if key[0] != self.grid.version:
+                    del self.fields[key]
+
+    def clear(self):
+        with self.lock:
+            self.fields.clear()
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __str__(self):
+        return 'fields={} hits={} misses={}'.format(len(self.fields), self.hits, self.misses)
@@ -0,0 +1,189 @@
+# Headless vehicle fleet
+#
+# Simulates many vehicles at once without Processing: positions, velocities
+# and accelerations are (n, 2) NumPy arrays and every steering behaviour works
+# on the whole fleet in a single call. The behaviours follow Vehicle.py
+# (arrive, update, applyForce, with PVector's limit/setMag semantics) and the
+# boundaries behaviour of NOC_06_03_StayWithinWalls.
+#
+# Runs on plain CPython with NumPy (not inside Processing):
+#
+#   fleet = VehicleFleet(positions)
+#   for frame in range(1000):
+#       fleet.step(targets, boundary=(25, 660, 660))
+#
+# Separation, alignment and cohesion between vehicles (flock) look neighbours
+# up in a SpatialHash that the fleet rebuilds every step.
+
+import numpy as np
+
+from SpatialHash import SpatialHash
+
+
+# Scales every row longer than maximum down to it (PVector.limit)
+def limit(vectors, maximum):
+    magnitudes = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    scale = np.where(magnitudes > maximum, maximum / np.where(magnitudes > 0, magnitudes, 1), 1.0)
+    return vectors * scale[:, None]
+
+# Sets the length of every row to magnitude; zero rows stay zero (PVector.setMag)
+def set_mag(vectors, magnitude):
+    magnitudes = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    scale = np.where(magnitudes > 0, magnitude / np.where(magnitudes > 0, magnitudes, 1), 0.0)
+    return vectors * scale[:, None]
+
+
+class VehicleFleet():
+
+    # Defaults match Filipe/Part2/Vehicle.py; maxspeed and maxforce can also be
+    # arrays with one value per vehicle
+    def __init__(self, positions, velocities=None, maxspeed=4, maxforce=2, r=6):
+        self.position = np.array(positions, dtype=float).reshape(-1, 2)
+        count = len(self.position)
+        if velocities is None:
+            self.velocity = np.tile(np.array([0.0, -2.0]), (count, 1))
+        else:
+            self.velocity = np.array(velocities, dtype=float).reshape(count, 2)
+        self.acceleration = np.zeros((count, 2))
+        self.maxspeed = np.broadcast_to(np.asarray(maxspeed, dtype=float), (count,)).copy()
+        self.maxforce = np.broadcast_to(np.asarray(maxforce, dtype=float), (count,)).copy()
+        self.r = r
+        # Neighbour index, rebuilt by update_index (flock does it every step)
+        self.index = None
+
+    def __len__(self):
+        return len(self.position)
+
+    # Method to update location
+    def update(self):
+        self.velocity += self.acceleration
+        self.velocity = limit(self.velocity, self.maxspeed)
+        self.position += self.velocity
+        self.acceleration[:] = 0
+
+    def apply_force(self, force):
+        # We could add mass here if we want A = F / M
+        self.acceleration += force
+
+    # Steers each vehicle towards its target (one row per vehicle, or a single
+    # target for all), slowing down within 100 pixels. STEER = DESIRED MINUS VELOCITY
+    def arrive(self, targets):
+        desired = np.asarray(targets, dtype=float) - self.position
+        distance = np.sqrt(np.einsum('ij,ij->i', desired, desired))
+        # Processing's map(d, 0, 100, 0, maxspeed) within 100 pixels, maxspeed beyond
+        magnitude = np.where(distance < 100, distance / 100.0 * self.maxspeed, self.maxspeed)
+        desired = set_mag(desired, magnitude)
+        steer = limit(desired - self.velocity, self.maxforce)
+        self.apply_force(steer)
+
+    # Steers vehicles closer than d pixels to a wall of a width x height area
+    # back inside. As in StayWithinWalls, a y correction replaces an x one
+    def boundaries(self, d, width, height):
+        x, y = self.position[:, 0], self.position[:, 1]
+        vx, vy = self.velocity[:, 0], self.velocity[:, 1]
+        speed = self.maxspeed
+
+        desired = np.full(self.position.shape, np.nan)
+        left, right = x < d, x > width - d
+        desired[left] = np.column_stack((speed[left], vy[left]))
+        desired[right] = np.column_stack((-speed[right], vy[right]))
+        top, bottom = y < d, y > height - d
+        desired[top] = np.column_stack((vx[top], speed[top]))
+        desired[bottom] = np.column_stack((vx[bottom], -speed[bottom]))
+
+        steering = left | right | top | bottom
+        if not steering.any():
+            return
+        desired = set_mag(desired[steering], speed[steering])
+        steer = limit(desired - self.velocity[steering], self.maxforce[steering])
+        self.acceleration[steering] += steer
+
+    def update_index(self, cell_size):
+        if self.index is None or self.index.cell_size != cell_size:
+            self.index = SpatialHash(cell_size)
+        self.index.rebuild(self.position)
+        return self.index
+
+    # Sums, for every vehicle, the weights of the pairs it belongs to: weights
+    # go to the first vehicle of a pair and mirrored to the second one (the
+    # pairs come from SpatialHash.neighbor_pairs with both_directions=False)
+    def accumulate(self, first, second, weights, mirrored):
+        count = len(self.position)
+        # bincount gives integers when there are no pairs at all
+        return np.column_stack((np.bincount(first, weights[:, 0], minlength=count) +
+                                np.bincount(second, mirrored[:, 0], minlength=count),
+                                np.bincount(first, weights[:, 1], minlength=count) +
+                                np.bincount(second, mirrored[:, 1], minlength=count))).astype(float)
+
+    def neighbor_counts(self, first, second):
+        count = len(self.position)
+        return np.bincount(first, minlength=count) + np.bincount(second, minlength=count)
+
+    # Reynolds steering towards each row of desired, skipping vehicles with no neighbours
+    def steer(self, desired, has_neighbors):
+        desired = set_mag(desired, self.maxspeed)
+        steer = limit(desired - self.velocity, self.maxforce)
+        steer[~has_neighbors] = 0
+        return steer
+
+    # Each behaviour takes the neighbour pairs (first, second, offsets,
+    # distances), each pair once, and returns the steering forces
+
+    # Separation: steer away from neighbours closer than radius, weighted by 1/distance
+    def separate(self, pairs, radius):
+        first, second, offsets, distances = pairs
+        close = (distances < radius) & (distances > 0)
+        first, second = first[close], second[close]
+        away = offsets[close] / (distances[close] ** 2)[:, None]
+        total = self.accumulate(first, second, away, -away)
+        return self.steer(total, self.neighbor_counts(first, second) > 0)
+
+    # Alignment: steer towards the average velocity of the neighbours
+    def align(self, pairs):
+        first, second = pairs[0], pairs[1]
+        heading = self.accumulate(first, second, self.velocity[second], self.velocity[first])
+        return self.steer(heading, self.neighbor_counts(first, second) > 0)
+
+    # Cohesion: seek the average position of the neighbours
+    def cohere(self, pairs):
+        first, second = pairs[0], pairs[1]
+        counts = self.neighbor_counts(first, second)
+        has_neighbors = counts > 0
+        center = self.accumulate(first, second, self.position[second], self.position[first])
+        center[has_neighbors] /= counts[has_neighbors][:, None]
+        return self.steer(center - self.position, has_neighbors)
+
+    # Applies separation, alignment and cohesion, looking neighbours up in the
+    # spatial hash (rebuilt here) once for all three behaviours
+    def flock(self, separation=25, neighbor_radius=50, weights=(1.5, 1.0, 1.0)):
+        index = self.update_index(max(separation, neighbor_radius))
+        pairs = index.neighbor_pairs(max(separation, neighbor_radius), both_directions=False)
+        first, second, offsets, distances = pairs
+        near = distances <= neighbor_radius
+        neighbors = (first[near], second[near], offsets[near], distances[near])
+
+        self.apply_force(weights[0] * self.separate(pairs, separation))
+        self.apply_force(weights[1] * self.align(neighbors))
+        self.apply_force(weights[2] * self.cohere(neighbors))
+
+    # Indices of the vehicles within radius of point (uses the last index built)
+    def neighbors_of(self, point, radius):
+        if self.index is None:
+            self.update_index(radius)
+        return self.index.query_radius(point, radius)
+
+    # Runs one frame for every vehicle: arrive at targets (if any), flock with
+    # flocking = (separation, neighbor_radius) (if any), stay within
+    # boundary = (d, width, height) (if any), then update
+    def step(self, targets=None, boundary=None, flocking=None):
+        if targets is not None:
+            self.arrive(targets)
+        if flocking is not None:
+            self.flock(*flocking)
+        if boundary is not None:
+            self.boundaries(*boundary)
+        self.update()
+
+    # Heading of each vehicle, as used by Vehicle.display (velocity.heading())
+    def headings(self):
+        return np.arctan2(self.velocity[:, 1], self.velocity[:, 0])
@@ -0,0 +1,270 @@
+# Hierarchical path planning (HPA*, Botea, Mueller and Schaeffer, 2004)
+#
+# The grid is cut into square clusters. Along every border shared by two
+# clusters, each run of walkable cell pairs becomes an entrance with one or
+# two transitions (the abstract nodes). Transitions of the same cluster are
+# joined by intra-cluster edges whose costs and cell paths are computed once
+# with a Dijkstra search restricted to the cluster, and cached.
+#
+# A query only searches the cluster of the agent, the cluster of the food and
+# the small abstract graph in between, then stitches the cached cell paths
+# together. Paths are near-optimal: the agent crosses each border at a
+# transition, not necessarily at the cheapest cell of the entrance.
+#
+# The abstraction is rebuilt when the grid version changes (see
+# CostGrid.set_floor).
+
+import heapq
+
+from A_star import SearchResult
+
+INF = float('inf')
+
+# Entrances at most this long get a single transition in the middle;
+# longer ones get one at each end
+SINGLE_TRANSITION_MAX = 5
+
+
+class ClusterGraph():
+
+    def __init__(self, grid, cluster_size=16):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.build()
+
+    def build(self):
+        grid = self.grid
+        size = self.cluster_size
+        self.version = grid.version
+        self.clusters_y = (grid.height + size - 1) // size
+        # Abstract nodes: their cell index, the node of each transition cell,
+        # the nodes of each cluster and the outgoing (node, cost, cell path) edges
+        self.cells = []
+        self.node_of_cell = {}
+        self.cluster_nodes = {}
+        self.edges = []
+        self.build_entrances()
+        self.build_intra_edges()
+
+    def cluster_of(self, index):
+        x, y = divmod(index, self.grid.height)
+        return (x // self.cluster_size) * self.clusters_y + y // self.cluster_size
+
+    # Cell bounds (x0, x1, y0, y1), end excluded, of the cluster holding index
+    def bounds_of(self, index):
+        grid = self.grid
+        size = self.cluster_size
+        x, y = divmod(index, grid.height)
+        x0, y0 = (x // size) * size, (y // size) * size
+        return x0, min(x0 + size, grid.width), y0, min(y0 + size, grid.height)
+
+    def add_node(self, index):
+        node = self.node_of_cell.get(index)
+        if node is None:
+            node = len(self.cells)
+            self.cells.append(index)
+            self.edges.append([])
+            self.node_of_cell[index] = node
+            self.cluster_nodes.setdefault(self.cluster_of(index), []).append(node)
+        return node
+
+    # Joins the two sides of a transition in both directions (entering a cell costs its cost)
+    def add_transition(self, a, b):
+        costs = self.grid.costs
+        node_a, node_b = self.add_node(a), self.add_node(b)
+        self.edges[node_a].append((node_b, costs[b], [b]))
+        self.edges[node_b].append((node_a, costs[a], [a]))
+
+    def add_entrance(self, pairs):
+        if len(pairs) <= SINGLE_TRANSITION_MAX:
+            self.add_transition(*pairs[len(pairs) // 2])
+        else:
+            self.add_transition(*pairs[0])
+            self.add_transition(*pairs[-1])
+
+    def build_entrances(self):
+        grid = self.grid
+        size = self.cluster_size
+        passable = grid.passable
+        index = grid.index
+
+        # Vertical borders: columns x and x + 1 belong to different clusters
+        for x in range(size - 1, grid.width - 1, size):
+            for y0 in range(0, grid.height, size):
+                run = []
+                for y in range(y0, min(y0 + size, grid.height)):
+                    a, b = index(x, y), index(x + 1, y)
+                    if passable[a] and passable[b]:
+                        run.append((a, b))
+                    elif run:
+                        self.add_entrance(run)
+                        run = []
+                if run:
+                    self.add_entrance(run)
+
+        # Horizontal borders: rows y and y + 1 belong to different clusters
+        for y in range(size - 1, grid.height - 1, size):
+            for x0 in range(0, grid.width, size):
+                run = []
+                for x in range(x0, min(x0 + size, grid.width)):
+                    a, b = index(x, y), index(x, y + 1)
+                    if passable[a] and passable[b]:
+                        run.append((a, b))
+                    elif run:
+                        self.add_entrance(run)
+                        run = []
+                if run:
+                    self.add_entrance(run)
+
+    def build_intra_edges(self):
+        for nodes in self.cluster_nodes.values():
+            for node in nodes:
+                distance, parent = self.local_search(self.cells[node])
+                for other in nodes:
+                    target = self.cells[other]
+                    if other != node and target in distance:
+                        self.edges[node].append((other, distance[target], walk_back(parent, target)))
+
+    # Dijkstra restricted to the cluster of source. Forward, it returns the cost
+    # from source to each cell and the parent of each cell; reversed, the cost
+    # from each cell to source and the next cell towards it
+    def local_search(self, source, reverse=False):
+        grid = self.grid
+        costs = grid.costs
+        x0, x1, y0, y1 = self.bounds_of(source)
+        height = grid.height
+
+        distance = {source: 0}
+        parent = {}
+        closed = set()
+        frontier = [(0, source)]
+        while frontier:
+            d, v = heapq.heappop(frontier)
+            if v in closed:
+                continue
+            closed.add(v)
+            for u in grid.neighbors(v):
+                x, y = divmod(u, height)
+                if not (x0 <= x < x1 and y0 <= y < y1):
+                    continue
+                step = d + (costs[v] if reverse else costs[u])
+                if step < distance.get(u, INF):
+                    distance[u] = step
+                    parent[u] = v
+                    heapq.heappush(frontier, (step, u))
+        return distance, parent
+
+    def is_stale(self):
+        return self.version != self.grid.version
+
+    def heuristic(self, index, goal):
+        ax, ay = divmod(index, self.grid.height)
+        bx, by = divmod(goal, self.grid.height)
+        return self.grid.min_cost * (abs(ax - bx) + abs(ay - by))
+
+    def search(self, agent_position, food_position):
+        if self.is_stale():
+            self.build()
+        grid = self.grid
+        if not (grid.is_passable(*agent_position) and grid.is_passable(*food_position)):
+            return SearchResult(None, None, 0, [], [])
+
+        start, goal = grid.index(*agent_position), grid.index(*food_position)
+        if start == goal:
+            return SearchResult([agent_position], 0, 0, [], [])
+
+        # Connect the agent to the transitions of its cluster and those of the
+        # food's cluster to the food
+        start_distance, start_parent = self.local_search(start)
+        goal_distance, goal_next = self.local_search(goal, reverse=True)
+        expansions = len(start_distance) + len(goal_distance)
+
+        best_cost, best_path = INF, None
+        if self.cluster_of(start) == self.cluster_of(goal) and goal in start_distance:
+            best_cost, best_path = start_distance[goal], walk_back(start_parent, goal)
+
+        goal_cluster = self.cluster_of(goal)
+        exits = {}
+        for node in self.cluster_nodes.get(goal_cluster, ()):
+            if self.cells[node] in goal_distance:
+                exits[node] = goal_distance[self.cells[node]]
+
+        # A* over the abstract graph; each entry carries the cell path that led to it
+        frontier = []
+        best = {}
+        order = 0
+        for node in self.cluster_nodes.get(self.cluster_of(start), ()):
+            cell = self.cells[node]
+            if cell in start_distance:
+                order += 1
+                best[node] = start_distance[cell]
+                heapq.heappush(frontier, (best[node] + self.heuristic(cell, goal), order, node,
+                                          start_distance[cell], (walk_back(start_parent, cell), None)))
+
+        closed = set()
+        while frontier:
+            f, _, node, d, path = heapq.heappop(frontier)
+            if f >= best_cost:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+            expansions += 1
+            if node in exits and d + exits[node] < best_cost:
+                best_cost = d + exits[node]
+                best_path = flatten(path) + walk_forward(goal_next, self.cells[node], goal)
+            for other, cost, cells in self.edges[node]:
+                step = d + cost
+                if other not in closed and step < best.get(other, INF):
+                    best[other] = step
+                    order += 1
+                    heapq.heappush(frontier, (step + self.heuristic(self.cells[other], goal), order,
+                                              other, step, (cells, path)))
+
+        if best_path is None:
+            return SearchResult(None, None, expansions, [], [])
+        position = grid.position
+        return SearchResult([agent_position] + [position(index) for index in best_path],
+                            best_cost, expansions, [], [])
+
+
+# Cells from (excluded) the search source to target (included), following parents
+def walk_back(parent, target):
+    cells = []
+    while target in parent:
+        cells.append(target)
+        target = parent[target]
+    cells.reverse()
+    return cells
+
+# Cells after source up to goal (included), following next pointers of a reversed search
+def walk_forward(next_cell, source, goal):
+    cells = []
+    while source != goal:
+        source = next_cell[source]
+        cells.append(source)
+    return cells
+
+# Joins the cell paths of an abstract search entry, (cells, previous) linked from the end
+def flatten(path):
+    pieces = []
+    while path is not None:
+        pieces.append(path[0])
+        path = path[1]
+    cells = []
+    for piece in reversed(pieces):
+        cells.extend(piece)
+    return cells
+
+
+# Returns the cluster graph of grid, building it on first use. Graphs are kept
+# on the grid (CostGrid.tables), so pass the same compiled grid to every query
+def cluster_graph(grid, cluster_size=16):
+    graphs = grid.tables.setdefault('clusters', {})
+    graph = graphs.get(cluster_size)
+    if graph is None:
+        graph = graphs[cluster_size] = ClusterGraph(grid, cluster_size)
+    return graph
+
+def plan_hierarchical(grid, agent_position, food_position, cluster_size=16):
+    return cluster_graph(grid, cluster_size).search(agent_position, food_position)
@@ -0,0 +1,85 @@
+# Landmark distance tables for the ALT heuristic (A*, Landmarks, Triangle
+# inequality; Goldberg and Harrelson, 2005)
+#
+# A few landmark cells are chosen far apart and a distance field is built
+# towards each of them. For a cell n, a goal t and a landmark L the triangle
+# inequality gives d(n, t) >= d(n, L) - d(t, L), so the largest of these
+# differences is an admissible estimate of the energy cost from n to t.
+#
+# The tables are kept on the grid (CostGrid.tables) and only pay off when the
+# same compiled grid is searched many times, so compile the map once
+# (CostGrid.compile_grid) and pass the grid to A_star.plan or search.
+
+from DistanceField import DistanceField
+
+INF = float('inf')
+
+
+class Landmarks():
+
+    def __init__(self, grid, count=4):
+        self.grid = grid
+        self.count = count
+        self.version = grid.version
+        self.fields = []
+        self.choose()
+
+    # Farthest-point selection: each new landmark is the reachable cell whose
+    # distance to the closest landmark already chosen is the largest
+    def choose(self):
+        grid = self.grid
+        first = None
+        for index in range(len(grid)):
+            if grid.passable[index]:
+                first = index
+                break
+        if first is None:
+            return
+
+        closest = None
+        candidate = first
+        while len(self.fields) < self.count and candidate is not None:
+            field = DistanceField(grid, grid.position(candidate))
+            self.fields.append(field)
+            distances = field.distance_to_goal
+            if closest is None:
+                closest = list(distances)
+            else:
+                closest = [min(a, b) for a, b in zip(closest, distances)]
+            best, candidate = 0, None
+            for index, distance in enumerate(closest):
+                if distance != INF and distance > best:
+                    best, candidate = distance, index
+
+    def positions(self):
+        return [field.goal for field in self.fields]
+
+    def is_stale(self):
+        return self.version != self.grid.version
+
+    # Returns the heuristic towards goal as a function of a cell index
+    def estimate_to(self, goal):
+        goal_index = self.grid.index(*goal)
+        tables = []
+        for field in self.fields:
+            goal_distance = field.distance_to_goal[goal_index]
+            if goal_distance != INF:
+                tables.append((field.distance_to_goal, goal_distance))
+
+        def estimate(index):
+            best = 0
+            for distances, goal_distance in tables:
+                bound = distances[index] - goal_distance
+                if bound > best:
+                    best = bound
+            return best
+        return estimate
+
+
+# Returns the landmark table of grid, (re)building it when missing or stale
+def landmarks_for(grid, count=4):
+    tables = grid.tables.setdefault('landmarks', {})
+    table = tables.get(count)
+    if table is None or table.is_stale():
+        table = tables[count] = Landmarks(grid, count)
+    return table
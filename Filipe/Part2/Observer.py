@@ -0,0 +1,165 @@
+# Search observers for A_star
+#
+# A_star.search reports its progress to an observer. The default one does
+# nothing, so plain runs pay only for a method call per event. Other
+# observers count events, record a compact trace or print the old per-round
+# dump of the frontier and explored lists.
+#
+# Expand, push and goal events receive the running AStarSearch and the (x, y)
+# state involved; the search exposes frontier_view() and explored_view().
+
+from array import array
+
+# Event codes stored in a TraceObserver buffer
+EVENT_START = 0
+EVENT_EXPAND = 1
+EVENT_PUSH = 2
+EVENT_GOAL = 3
+EVENT_FAIL = 4
+
+EVENT_NAMES = {
+               EVENT_START: 'start',
+               EVENT_EXPAND: 'expand',
+               EVENT_PUSH: 'push',
+               EVENT_GOAL: 'goal',
+               EVENT_FAIL: 'fail'
+               }
+
+
+# No-op observer; subclasses override only the events they need
+class SearchObserver():
+
+    def on_start(self, start, goal):
+        pass
+
+    def on_expand(self, search, state):
+        pass
+
+    def on_push(self, search, state):
+        pass
+
+    def on_goal(self, search, state):
+        pass
+
+    def on_fail(self):
+        pass
+
+
+# Shared default instance (it holds no state)
+NULL_OBSERVER = SearchObserver()
+
+
+# Counts expansions and pushes and tracks the largest frontier seen
+class CounterObserver(SearchObserver):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.searches = 0
+        self.expansions = 0
+        self.pushes = 0
+        self.max_frontier = 0
+        self.failures = 0
+
+    def on_start(self, start, goal):
+        self.searches += 1
+
+    def on_expand(self, search, state):
+        self.expansions += 1
+        if len(search.frontier) > self.max_frontier:
+            self.max_frontier = len(search.frontier)
+
+    def on_push(self, search, state):
+        self.pushes += 1
+
+    def on_fail(self):
+        self.failures += 1
+
+    def __str__(self):
+        return 'searches={} expansions={} pushes={} max_frontier={} failures={}'.format(
+            self.searches, self.expansions, self.pushes, self.max_frontier, self.failures)
+
+
+# Records every event as an (event, x, y) triple in a flat int array
+class TraceObserver(SearchObserver):
+
+    def __init__(self, record_pushes=True):
+        self.record_pushes = record_pushes
+        self.buffer = array('i')
+
+    def clear(self):
+        self.buffer = array('i')
+
+    def record(self, event, state):
+        self.buffer.append(event)
+        self.buffer.append(state[0])
+        self.buffer.append(state[1])
+
+    def on_start(self, start, goal):
+        self.record(EVENT_START, start)
+
+    def on_expand(self, search, state):
+        self.record(EVENT_EXPAND, state)
+
+    def on_push(self, search, state):
+        if self.record_pushes:
+            self.record(EVENT_PUSH, state)
+
+    def on_goal(self, search, state):
+        self.record(EVENT_GOAL, state)
+
+    def on_fail(self):
+        self.record(EVENT_FAIL, (-1, -1))
+
+    # Iterates over the recorded events as (event_name, (x, y))
+    def events(self):
+        buffer = self.buffer
+        for i in range(0, len(buffer), 3):
+            yield EVENT_NAMES[buffer[i]], (buffer[i + 1], buffer[i + 2])
+
+    def __len__(self):
+        return len(self.buffer) // 3
+
+
+# Prints the frontier and explored lists every round (the old behaviour)
+class ConsoleObserver(SearchObserver):
+
+    def __init__(self):
+        self.rodada = 0
+
+    def on_start(self, start, goal):
+        self.rodada = 0
+
+    def on_expand(self, search, state):
+        print("\n\nRodada " + str(self.rodada))
+        print("\nFronteira atual: " + str(search.frontier_view()))
+        print("\nNos ja visitados: " + str(search.explored_view()))
+        self.rodada += 1
+
+
+# Forwards every event to several observers (e.g. counters plus the visualizer)
+class MultiObserver(SearchObserver):
+
+    def __init__(self, *observers):
+        self.observers = list(observers)
+
+    def on_start(self, start, goal):
+        for observer in self.observers:
+            observer.on_start(start, goal)
+
+    def on_expand(self, search, state):
+        for observer in self.observers:
+            observer.on_expand(search, state)
+
+    def on_push(self, search, state):
+        for observer in self.observers:
+            observer.on_push(search, state)
+
+    def on_goal(self, search, state):
+        for observer in self.observers:
+            observer.on_goal(search, state)
+
+    def on_fail(self):
+        for observer in self.observers:
+            observer.on_fail()
@@ -8,16 +8,91 @@
 # Centro de Informatica - UFPE 2021.1 (Pos-Graduacao)
 # Introducao a Agentes Inteligentes
 
+import math
+
+
+# The segment geometry (unit direction, length and distance from the start of
+# the path to each segment) is computed once as points are added, so following
+# the path never recomputes it per frame.
 class Path():
 
     def __init__(self):
         self.points = []
         self.radius = 10
+        # Segment i goes from points[i] to points[i + 1]
+        self.directions = []
+        self.lengths = []
+        self.starts = []
+        self.length = 0
 
     def addPoint(self, x, y):
         point = PVector(x, y)
+        if self.points:
+            previous = self.points[-1]
+            length = math.hypot(x - previous.x, y - previous.y)
+            if length > 0:
+                self.directions.append(((x - previous.x) / length, (y - previous.y) / length))
+            else:
+                self.directions.append((0, 0))
+            self.lengths.append(length)
+            self.starts.append(self.length)
+            self.length += length
         self.points.append(point)
 
+    def segment_count(self):
+        return len(self.lengths)
+
+    # Normal point of position on segment (clamped to its ends): returns
+    # (x, y, distance along the segment, distance from position)
+    def project_on(self, position, segment):
+        start = self.points[segment]
+        dx, dy = self.directions[segment]
+        along = (position.x - start.x) * dx + (position.y - start.y) * dy
+        along = min(max(along, 0), self.lengths[segment])
+        x = start.x + dx * along
+        y = start.y + dy * along
+        return x, y, along, math.hypot(position.x - x, position.y - y)
+
+    # Normal point of position on the path, searching forward from segment
+    # (the one found on the previous frame): it only moves on to the next
+    # segment while that one is at least as close, so a vehicle walking the
+    # path pays O(1) amortized per frame instead of a scan over all segments.
+    # Returns (x, y, segment, distance along the segment, distance from position)
+    def project(self, position, segment=0):
+        if not self.lengths:
+            end = self.points[-1]
+            return end.x, end.y, 0, 0, math.hypot(position.x - end.x, position.y - end.y)
+        last = len(self.lengths) - 1
+        segment = min(max(segment, 0), last)
+        x, y, along, distance = self.project_on(position, segment)
+        while segment < last:
+            next_x, next_y, next_along, next_distance = self.project_on(position, segment + 1)
+            if next_distance > distance:
+                break
+            segment += 1
+            x, y, along, distance = next_x, next_y, next_along, next_distance
+        return x, y, segment, along, distance
+
+    # Point ahead pixels further along the path from (segment, along), stopping at the end
+    def point_along(self, segment, along, ahead):
+        if not self.lengths:
+            return self.points[-1].copy()
+        along += ahead
+        last = len(self.lengths) - 1
+        while segment < last and along > self.lengths[segment]:
+            along -= self.lengths[segment]
+            segment += 1
+        along = min(along, self.lengths[segment])
+        start = self.points[segment]
+        dx, dy = self.directions[segment]
+        return PVector(start.x + dx * along, start.y + dy * along)
+
+    # Distance left to the end of the path from (segment, along)
+    def remaining(self, segment, along):
+        if not self.lengths:
+            return 0
+        return self.length - self.starts[segment] - along
+
     def getStart(self):
         return self.points[0]
 
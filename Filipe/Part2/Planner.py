@@ -0,0 +1,98 @@
+# Background path planning
+#
+# Runs the A* searches in a worker thread so the sketch keeps drawing (and the
+# vehicle keeps moving) while a path is being computed. Queries are queued
+# with request() and picked up with poll() once they are done; a query can be
+# requested well before it is needed, e.g. the path from the current food to
+# the next one while the agent is still walking to the current food.
+#
+# Results are tied to the map version (CostGrid.version) they were planned
+# on: after set_floor, older results are dropped and planned again.
+
+import threading
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+import A_star
+from CostGrid import compile_grid
+from Observer import NULL_OBSERVER
+
+
+class BackgroundPlanner():
+
+    def __init__(self, map, observer=NULL_OBSERVER):
+        self.grid = compile_grid(map)
+        # The observer is only called from the worker thread
+        self.observer = observer
+        self.queries = Queue()
+        self.lock = threading.Lock()
+        # (start, goal, version) -> SearchResult, and the keys still queued or running
+        self.results = {}
+        self.pending = set()
+        self.worker = threading.Thread(target=self.work)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def key(self, start, goal):
+        return (tuple(start), tuple(goal), self.grid.version)
+
+    # Queues a search from start to goal, unless it is already queued or done
+    def request(self, start, goal):
+        key = self.key(start, goal)
+        with self.lock:
+            if key in self.results or key in self.pending:
+                return
+            self.pending.add(key)
+        self.queries.put(key)
+
+    def is_pending(self, start, goal):
+        with self.lock:
+            return self.key(start, goal) in self.pending
+
+    # Returns (and forgets) the SearchResult from start to goal, or None while
+    # it is not ready yet. Queues the search if it was never requested
+    def poll(self, start, goal):
+        key = self.key(start, goal)
+        with self.lock:
+            result = self.results.pop(key, None)
+            if result is not None:
+                return result
+            queued = key in self.pending
+        if not queued:
+            self.request(start, goal)
+        return None
+
+    # Blocks until the search from start to goal is done and returns it
+    def wait(self, start, goal):
+        self.request(start, goal)
+        self.queries.join()
+        return self.poll(start, goal)
+
+    # Stops the worker after the searches already queued
+    def stop(self):
+        self.queries.put(None)
+
+    def work(self):
+        while True:
+            key = self.queries.get()
+            try:
+                if key is None:
+                    return
+                start, goal, version = key
+                if version != self.grid.version:
+                    # The map changed after the request; poll asks again with the new version
+                    with self.lock:
+                        self.pending.discard(key)
+                    continue
+                result = A_star.plan(self.grid, start, goal, self.observer)
+                with self.lock:
+                    self.pending.discard(key)
+                    # Drop results planned on older maps
+                    for old in [old for old in self.results if old[2] != version]:
+                        del self.results[old]
+                    self.results[key] = result
+            finally:
+                self.queries.task_done()
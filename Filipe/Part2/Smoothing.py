@@ -0,0 +1,142 @@
+# Path smoothing for A* solutions
+#
+# A* returns one state per grid cell, so a straight corridor becomes dozens of
+# waypoints. smooth() shrinks the list in two passes:
+#   1. collinear elimination: drops every state in the middle of a straight run
+#   2. string pulling: from each kept waypoint, jumps to the farthest later
+#      one that can be reached in a straight line. The line must only cross
+#      passable cells and, added up over the cells it crosses, cost no more
+#      energy than the part of the A* path it replaces, so a shortcut never
+#      cuts through mud or water the search went around.
+#
+# The line test covers every cell the segment between the two cell centres
+# touches (both cells when it goes exactly through a corner).
+
+from CostGrid import compile_grid
+
+
+# Waypoint counts of the paths smoothed so far
+class SmoothingStats():
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.paths = 0
+        self.states = 0
+        self.compressed = 0
+        self.waypoints = 0
+        self.last = (0, 0)
+
+    def record(self, states, compressed, waypoints):
+        self.paths += 1
+        self.states += states
+        self.compressed += compressed
+        self.waypoints += waypoints
+        self.last = (states, waypoints)
+
+    # Fraction of the states removed over all the paths smoothed
+    def reduction(self):
+        if self.states == 0:
+            return 0.0
+        return 1.0 - float(self.waypoints) / self.states
+
+    def __str__(self):
+        return 'paths={} states={} collinear={} waypoints={} reduction={:.0%}'.format(
+            self.paths, self.states, self.compressed, self.waypoints, self.reduction())
+
+
+# Cells touched by the segment between the centres of cells start and end
+def line_cells(start, end):
+    x, y = start
+    dx = abs(end[0] - x)
+    dy = abs(end[1] - y)
+    step_x = 1 if end[0] > x else -1
+    step_y = 1 if end[1] > y else -1
+    cells = [(x, y)]
+    moved_x = moved_y = 0
+    while moved_x < dx or moved_y < dy:
+        # Which cell border the segment crosses first: (0.5 + moved_x) / dx vs (0.5 + moved_y) / dy
+        decision = (1 + 2 * moved_x) * dy - (1 + 2 * moved_y) * dx
+        if decision == 0:
+            # Exactly through a corner: cover both cells beside it
+            cells.append((x + step_x, y))
+            cells.append((x, y + step_y))
+            x += step_x
+            y += step_y
+            moved_x += 1
+            moved_y += 1
+        elif decision < 0:
+            x += step_x
+            moved_x += 1
+        else:
+            y += step_y
+            moved_y += 1
+        cells.append((x, y))
+    return cells
+
+
+# Keeps the first and last states and every state where the direction changes
+def remove_collinear(path):
+    if len(path) < 3:
+        return list(path)
+    kept = [path[0]]
+    for i in range(1, len(path) - 1):
+        before = (path[i][0] - path[i - 1][0], path[i][1] - path[i - 1][1])
+        after = (path[i + 1][0] - path[i][0], path[i + 1][1] - path[i][1])
+        # Cross product: zero when the three states are on one line
+        if before[0] * after[1] - before[1] * after[0] != 0:
+            kept.append(path[i])
+    kept.append(path[-1])
+    return kept
+
+
+# Energy cost of walking the straight line from start to end, or None when it
+# crosses an obstacle (the cost of the start cell is not counted, as in A*)
+def line_cost(grid, start, end):
+    total = 0
+    for x, y in line_cells(start, end)[1:]:
+        if not grid.in_bounds(x, y) or not grid.is_passable(x, y):
+            return None
+        total += grid.cost(x, y)
+    return total
+
+
+# Greedy string pulling over waypoints, where path_costs[i] is the energy
+# cost of the A* path from the first state to waypoints[i]. Candidates are
+# tried from the last waypoint back, so a blocked or costlier line in between
+# does not hide a farther waypoint that can be reached
+def pull_string(grid, waypoints, path_costs):
+    pulled = [waypoints[0]]
+    anchor = 0
+    while anchor < len(waypoints) - 1:
+        reach = anchor + 1
+        for candidate in range(len(waypoints) - 1, anchor + 1, -1):
+            cost = line_cost(grid, waypoints[anchor], waypoints[candidate])
+            if cost is not None and cost <= path_costs[candidate] - path_costs[anchor]:
+                reach = candidate
+                break
+        pulled.append(waypoints[reach])
+        anchor = reach
+    return pulled
+
+
+# Smooths an A* path (list of (x, y) states) over map and returns the new
+# waypoints, recording the counts in stats (a SmoothingStats) when given
+def smooth(map, path, stats=None):
+    grid = compile_grid(map)
+    path = [tuple(state) for state in path]
+    compressed = remove_collinear(path)
+
+    # Energy cost of the A* path up to each kept waypoint
+    costs = {}
+    total = 0
+    for i, state in enumerate(path):
+        if i > 0:
+            total += grid.cost(*state)
+        costs[state] = total
+    waypoints = pull_string(grid, compressed, [costs[state] for state in compressed])
+
+    if stats is not None:
+        stats.record(len(path), len(compressed), len(waypoints))
+    return waypoints
@@ -0,0 +1,122 @@
+# Uniform-grid spatial hash for neighbour queries between vehicles
+#
+# Points are bucketed into square cells of cell_size pixels; the buckets are
+# kept as one array of point indices sorted by cell key, so building the index
+# is a single argsort and looking a cell up is a binary search. Radius
+# queries and the all-pairs neighbour search only visit the cells around each
+# point, instead of comparing every pair of vehicles.
+
+import numpy as np
+
+
+class SpatialHash():
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.positions = np.zeros((0, 2))
+        self.reach = 1
+        self.order = np.zeros(0, dtype=np.int64)
+        self.sorted_keys = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def cell_keys(self, cells):
+        return (cells[:, 0] - self.origin[0]) * self.stride + (cells[:, 1] - self.origin[1])
+
+    # Rebuilds the index for new positions. reach is the largest radius, in
+    # cells, that queries will use (radius <= reach * cell_size)
+    def rebuild(self, positions, reach=1):
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        self.reach = reach
+        if len(self.positions) == 0:
+            self.order = np.zeros(0, dtype=np.int64)
+            self.sorted_keys = np.zeros(0, dtype=np.int64)
+            return self
+        cells = np.floor(self.positions / self.cell_size).astype(np.int64)
+        # Leave reach empty cells on every side so neighbouring keys never wrap around
+        self.origin = cells.min(axis=0) - reach
+        self.stride = int(cells[:, 1].max() - self.origin[1]) + reach + 1
+        keys = self.cell_keys(cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+        self.cells = cells
+        return self
+
+    def reach_for(self, radius):
+        return max(1, int(np.ceil(radius / self.cell_size)))
+
+    # Indices of the points within radius of point
+    def query_radius(self, point, radius):
+        if len(self.positions) == 0:
+            return np.zeros(0, dtype=np.int64)
+        point = np.asarray(point, dtype=float)
+        reach = self.reach_for(radius)
+        cx, cy = np.floor(point / self.cell_size).astype(np.int64)
+        found = []
+        for dx in range(-reach, reach + 1):
+            x = cx + dx - self.origin[0]
+            y0 = max(cy - reach - self.origin[1], 0)
+            y1 = min(cy + reach - self.origin[1], self.stride - 1)
+            if x < 0 or y1 < y0:
+                continue
+            # Cells of one column of the window are consecutive keys
+            start = np.searchsorted(self.sorted_keys, x * self.stride + y0, 'left')
+            end = np.searchsorted(self.sorted_keys, x * self.stride + y1, 'right')
+            found.append(self.order[start:end])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.concatenate(found)
+        offsets = self.positions[candidates] - point
+        return candidates[np.einsum('ij,ij->i', offsets, offsets) <= radius * radius]
+
+    # Every ordered pair (i, j), i != j, of points within radius of each other,
+    # with the offset positions[i] - positions[j] and its length.
+    #
+    # Works on the points in key order and only looks at the half of the window
+    # after each point (the columns to its right, and the cells above it in its
+    # own column); the other half of the pairs are the same pairs mirrored.
+    # With both_directions=False each pair is returned once, in one direction.
+    def neighbor_pairs(self, radius, both_directions=True):
+        reach = self.reach_for(radius)
+        if reach > self.reach:
+            self.rebuild(self.positions, reach)
+        count = len(self.positions)
+        if count == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros((0, 2)), np.zeros(0)
+
+        keys = self.sorted_keys
+        points = self.positions[self.order]
+        ranks = np.arange(count)
+        firsts, seconds = [], []
+        for dx in range(0, reach + 1):
+            if dx == 0:
+                # Own column: the points after this one, up to reach cells above
+                start = ranks + 1
+            else:
+                start = np.searchsorted(keys, keys + dx * self.stride - reach, 'left')
+            end = np.searchsorted(keys, keys + dx * self.stride + reach, 'right')
+            lengths = end - start
+            total = int(lengths.sum())
+            if total <= 0:
+                continue
+            first = np.repeat(ranks, lengths)
+            # Position of each candidate inside its run: 0, 1, ... lengths[i] - 1
+            run_starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+            second = np.repeat(start, lengths) + (np.arange(total) - run_starts)
+            offsets = points[first] - points[second]
+            near = np.einsum('ij,ij->i', offsets, offsets) <= radius * radius
+            firsts.append(first[near])
+            seconds.append(second[near])
+
+        if not firsts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros((0, 2)), np.zeros(0)
+        first = self.order[np.concatenate(firsts)]
+        second = self.order[np.concatenate(seconds)]
+        if both_directions:
+            first, second = np.concatenate((first, second)), np.concatenate((second, first))
+        offsets = self.positions[first] - self.positions[second]
+        distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+        return first, second, offsets, distances
@@ -17,6 +17,9 @@ class Vehicle():
         self.r = 6
         self.maxspeed = 4
         self.maxforce = 2
+        # Path being followed and the segment its normal point was on last frame
+        self.path = None
+        self.path_segment = 0
 
     # Method to update location
     def update(self):
@@ -53,6 +56,36 @@ class Vehicle():
 
         self.applyForce(steer)
 
+    # A method that calculates a steering force towards a target at full speed
+    def seek(self, target):
+        desired = target - self.position
+        desired.setMag(self.maxspeed)
+        steer = desired - self.velocity
+        steer.limit(self.maxforce)
+        self.applyForce(steer)
+
+    # Reynolds path following: predicts the position lookahead pixels ahead,
+    # projects it on the path and, when the prediction leaves the path radius,
+    # seeks the point ahead pixels further along the path. The projection
+    # starts from the segment cached in path_segment. Close to the end of the
+    # path it arrives at the last point instead.
+    def follow(self, path, lookahead=20, ahead=5):
+        if path is not self.path:
+            self.path = path
+            self.path_segment = 0
+
+        predict = self.velocity.copy()
+        predict.setMag(lookahead)
+        predict.add(self.position)
+
+        _, _, segment, along, distance = path.project(predict, self.path_segment)
+        self.path_segment = segment
+
+        if path.remaining(segment, along) <= lookahead:
+            self.arrive(path.getEnd())
+        elif distance > path.radius:
+            self.seek(path.point_along(segment, along, ahead))
+
     def display(self):
         # Draw a triangle rotated in the direction of velocity
         theta = self.velocity.heading() + PI / 2
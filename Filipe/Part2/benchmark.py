@@ -0,0 +1,132 @@
+# Planner benchmarks
+#
+# Runs outside Processing (plain CPython):
+#
+#   python benchmark.py batch --size 120 --queries 200
+#   python benchmark.py hierarchical --size 500 --queries 50
+#
+# Maps are generated at random with the same floor types as Part2.pyde:
+# 0 safe floor, 1 obstacle, 2 sand, 3 mud and 4 water.
+
+import argparse
+import random
+import time
+
+import A_star
+import Batch
+import Hierarchical
+from CostGrid import CostGrid
+
+
+# Generates a width x height map made of rectangular patches of terrain over
+# safe floor, with scattered obstacle walls
+def generate_terrain(width, height, seed=0, patches=None, walls=None):
+    rng = random.Random(seed)
+    map = [[0 for y in range(height)] for x in range(width)]
+    if patches is None:
+        patches = (width * height) // 150
+    if walls is None:
+        walls = (width * height) // 300
+
+    for _ in range(patches):
+        floor_type = rng.choice((2, 3, 4))
+        w, h = rng.randint(2, 12), rng.randint(2, 12)
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        for x in range(x0, min(width, x0 + w)):
+            for y in range(y0, min(height, y0 + h)):
+                map[x][y] = floor_type
+
+    for _ in range(walls):
+        length = rng.randint(3, 15)
+        x, y = rng.randrange(width), rng.randrange(height)
+        dx, dy = rng.choice(((1, 0), (0, 1)))
+        for _ in range(length):
+            if 0 <= x < width and 0 <= y < height:
+                map[x][y] = 1
+            x, y = x + dx, y + dy
+
+    return map
+
+
+# Generates random (start, goal) pairs on free cells
+def generate_queries(map, count, seed=0):
+    rng = random.Random(seed)
+    free = [(x, y) for x in range(len(map)) for y in range(len(map[x])) if map[x][y] != 1]
+    return [tuple(rng.sample(free, 2)) for _ in range(count)]
+
+
+def timed(function, *args):
+    start = time.time()
+    value = function(*args)
+    return value, time.time() - start
+
+
+def loop_search(map, queries):
+    results = []
+    for start, goal in queries:
+        try:
+            results.append(A_star.search(map, start, goal))
+        except Exception:
+            results.append(None)
+    return results
+
+
+# Compares looping A_star.search with Batch.batch_search (serial and pooled)
+def benchmark_batch(size, count, processes, seed):
+    map = generate_terrain(size, size, seed)
+    queries = generate_queries(map, count, seed)
+    print('Map {0}x{0}, {1} queries'.format(size, count))
+
+    loop_paths, loop_time = timed(loop_search, map, queries)
+    print('  A_star.search loop:    {:8.3f}s'.format(loop_time))
+
+    for workers in (1, processes):
+        results, batch_time = timed(Batch.batch_search, map, queries, workers)
+        paths = [result.path for result in results]
+        print('  batch_search ({} proc): {:8.3f}s  speedup {:5.2f}x  same paths: {}'.format(
+            workers, batch_time, loop_time / batch_time, paths == loop_paths))
+
+
+# Compares plain A* with the hierarchical planner: expansions, latency and path cost
+def benchmark_hierarchical(size, count, cluster_size, seed):
+    map = generate_terrain(size, size, seed)
+    queries = generate_queries(map, count, seed)
+    grid = CostGrid(map)
+    print('Map {0}x{0}, {1} queries, clusters of {2}x{2}'.format(size, count, cluster_size))
+
+    graph, build_time = timed(Hierarchical.ClusterGraph, grid, cluster_size)
+    print('  abstraction build: {:8.3f}s  ({} abstract nodes)'.format(build_time, len(graph.cells)))
+
+    grid.tables['clusters'] = {cluster_size: graph}
+    totals = {}
+    for planner in A_star.PLANNERS:
+        start = time.time()
+        results = [A_star.plan_with(planner, grid, a, b, cluster_size=cluster_size) for a, b in queries]
+        totals[planner] = (time.time() - start, results)
+
+    for planner in A_star.PLANNERS:
+        elapsed, results = totals[planner]
+        expansions = sum(result.expansions for result in results)
+        cost = sum(result.cost for result in results if result.found())
+        print('  {:12s} {:8.2f}ms/query  {:9.1f} expansions/query  total cost {:9.0f}'.format(
+            planner, 1000 * elapsed / count, float(expansions) / count, cost))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Path planner benchmarks')
+    parser.add_argument('benchmark', choices=['batch', 'hierarchical'])
+    parser.add_argument('--size', type=int, default=120)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--cluster-size', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.benchmark == 'batch':
+        benchmark_batch(args.size, args.queries, args.processes, args.seed)
+    elif args.benchmark == 'hierarchical':
+        benchmark_hierarchical(args.size, args.queries, args.cluster_size, args.seed)
+
+
+if __name__ == '__main__':
+    main()
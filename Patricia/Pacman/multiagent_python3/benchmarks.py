@@ -0,0 +1,136 @@
+# benchmarks.py
+# -------------
+# Micro-benchmarks for the game engine used by the search agents.
+#
+#   python benchmarks.py                      (successors and hashes/second on mediumClassic)
+#   python benchmarks.py -l smallClassic -n 50000 -r 5
+#   python benchmarks.py --root-split -a ExpectimaxAgent -d 4 -w 1,2,4,8
+
+import pickle
+import time
+from collections import deque
+from optparse import OptionParser
+
+import layout
+import multiAgents
+from pacman import GameState
+
+
+def initialState(layoutName, numGhosts=None):
+    """
+    Returns the starting GameState of a layout (with all of its ghosts by default).
+    """
+    board = layout.getLayout(layoutName)
+    if board == None:
+        raise Exception("The layout " + layoutName + " cannot be found")
+    state = GameState()
+    state.initialize(board, board.getNumGhosts() if numGhosts == None else numGhosts)
+    return state
+
+def successorBenchmark(state, count):
+    """
+    Expands the game tree breadth first from state, agents moving in turn as
+    in minimax, until count successors were generated.  Returns the number of
+    successors generated and the time it took.
+    """
+    numAgents = state.getNumAgents()
+    frontier = deque([(state, 0)])
+    generated = 0
+    start = time.perf_counter()
+    while frontier and generated < count:
+        state, agentIndex = frontier.popleft()
+        nextAgent = (agentIndex + 1) % numAgents
+        for action in state.getLegalActions(agentIndex):
+            successor = state.generateSuccessor(agentIndex, action)
+            generated += 1
+            if not (successor.isWin() or successor.isLose()):
+                frontier.append((successor, nextAgent))
+    elapsed = time.perf_counter() - start
+    GameState.getAndResetExplored()
+    return generated, elapsed
+
+def hashBenchmark(state, count):
+    """
+    Generates count states as successorBenchmark does and times hashing each
+    of them once.  Returns the number of states hashed and the time it took.
+    """
+    numAgents = state.getNumAgents()
+    frontier = deque([(state, 0)])
+    states = []
+    while frontier and len(states) < count:
+        state, agentIndex = frontier.popleft()
+        for action in state.getLegalActions(agentIndex):
+            successor = state.generateSuccessor(agentIndex, action)
+            states.append(successor)
+            if not (successor.isWin() or successor.isLose()):
+                frontier.append((successor, (agentIndex + 1) % numAgents))
+    GameState.getAndResetExplored()
+    start = time.perf_counter()
+    for state in states:
+        hash(state)
+    return len(states), time.perf_counter() - start
+
+def rootSplitBenchmark(state, agentName, depth, workers, repeat):
+    """
+    Times the root move choice of a search agent, serial (workers=0) and
+    root-parallel over each number of workers.  Prints the best time of each
+    and the speedup over the serial search.  The pool is started before the
+    runs that are timed.
+    """
+    agentClass = getattr(multiAgents, agentName)
+    print('%s depth %d: state pickled %d bytes, packed %d bytes' % (
+        agentName, depth, len(pickle.dumps(state, -1)), len(pickle.dumps(state.pack(), -1))))
+    serial = None
+    for count in [0] + workers:
+        agent = agentClass(depth=str(depth), workers=str(count))
+        agent.getAction(state)
+        best = None
+        for run in range(repeat):
+            start = time.perf_counter()
+            action = agent.getAction(state)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best == None else min(best, elapsed)
+        agent.final(state)
+        if serial == None:
+            serial = best
+        print('  %s: %s in %.3fs, speedup %.2f' % ('serial' if count == 0 else '%d workers' % count,
+                                                 action, best, serial / best))
+
+def readCommand(argv):
+    parser = OptionParser("USAGE: python benchmarks.py <options>")
+    parser.add_option('-l', '--layout', dest='layout', default='mediumClassic',
+                      help='the layout to start from [Default: %default]')
+    parser.add_option('-n', '--successors', dest='successors', type='int', default=20000,
+                      help='successors to generate per run [Default: %default]')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=3,
+                      help='runs to make, the best one is reported [Default: %default]')
+    parser.add_option('-e', '--explored', dest='explored', default='off',
+                      help='explored policy while generating successors: off, count or set [Default: %default]')
+    parser.add_option('--root-split', dest='rootSplit', action='store_true', default=False,
+                      help='benchmark the root-parallel search instead of the engine')
+    parser.add_option('-a', '--agent', dest='agent', default='AlphaBetaAgent',
+                      help='search agent for --root-split [Default: %default]')
+    parser.add_option('-d', '--depth', dest='depth', type='int', default=4,
+                      help='search depth for --root-split [Default: %default]')
+    parser.add_option('-w', '--workers', dest='workers', default='1,2,4,8',
+                      help='comma separated worker counts for --root-split [Default: %default]')
+    options, _ = parser.parse_args(argv)
+    return options
+
+def main(argv):
+    options = readCommand(argv)
+    GameState.setExploredPolicy(options.explored)
+    if options.rootSplit:
+        workers = [int(count) for count in options.workers.split(',')]
+        rootSplitBenchmark(initialState(options.layout), options.agent, options.depth, workers, options.repeat)
+        return
+    for name, benchmark in [('successors', successorBenchmark), ('hashes', hashBenchmark)]:
+        best = None
+        for run in range(options.repeat):
+            count, elapsed = benchmark(initialState(options.layout), options.successors)
+            best = elapsed if best == None else min(best, elapsed)
+        print('%s: %d %s in %.3fs, %.0f %s/s' % (options.layout, count, name, best, count / best, name))
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv[1:])
@@ -22,6 +22,8 @@
 
 from util import *
 import time, os
+import itertools
+import random
 import traceback
 import sys
 
@@ -159,12 +161,23 @@ class AgentState:
     def getDirection(self):
         return self.configuration.getDirection()
 
+# Cell positions in bit order for each grid size, and the table turning the
+# ASCII digits of bin() into 0/1 bytes (used by Grid.asList)
+_gridPositions = {}
+_ONES = bytes.maketrans(b'01', b'\x00\x01')
+
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
+    A 2-dimensional array of booleans backed by a bitboard.  Data is accessed
     via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
     y vertical and the origin (0,0) in the bottom left corner.
 
+    All the cells live in a single Python int (bits): cell (x,y) is bit
+    x * height + y.  Copying a grid copies one int, count is a popcount,
+    asList walks the set bits only and the hash is the hash of the int (the
+    same value the old list-of-lists hash computed).  grid[x] returns a
+    GridColumn view whose [y] reads and writes one bit.
+
     The __str__ method constructs an output that is oriented like a pacman board.
     """
     def __init__(self, width, height, initialValue=False, bitRepresentation=None):
@@ -173,58 +186,72 @@ class Grid:
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(height)] for x in range(width)]
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
+        self._columns = None
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
     def __getitem__(self, i):
-        return self.data[i]
+        columns = self._columns
+        if columns is None:
+            columns = self._columns = [GridColumn(self, x) for x in range(self.width)]
+        return columns[i]
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        column = self[key]
+        for y in range(self.height):
+            column[y] = item[y]
+
+    @property
+    def data(self):
+        """
+        The cells as a list of columns of booleans (a copy; write through grid[x][y])
+        """
+        return [list(self[x]) for x in range(self.width)]
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out = [[str(self[x][y])[0] for x in range(self.width)] for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
 
     def __eq__(self, other):
         if other == None: return False
-        return self.data == other.data
+        return self.bits == other.bits and self.width == other.width and self.height == other.height
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self.bits)
 
     def copy(self):
         g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g.bits = self.bits
         return g
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        # Ints are immutable, so a copy is already as cheap as sharing the data
+        return self.copy()
 
     def count(self, item =True ):
-        return sum([x.count(item) for x in self.data])
+        ones = popcount(self.bits)
+        if item: return ones
+        return self.width * self.height - ones
 
     def asList(self, key = True):
-        list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: list.append( (x,y) )
-        return list
+        # The binary digits of bits, lowest first, select the cells to keep
+        bits = self.bits
+        if not key:
+            bits = ~bits & ((1 << (self.width * self.height)) - 1)
+        digits = bin(bits)[:1:-1].encode('ascii')
+        return list(itertools.compress(self._positions(), digits.translate(_ONES)))
+
+    def _positions(self):
+        "(x,y) of every cell, in bit order (shared by all grids of the same size)"
+        size = (self.width, self.height)
+        if size not in _gridPositions:
+            _gridPositions[size] = [(x, y) for x in range(self.width) for y in range(self.height)]
+        return _gridPositions[size]
 
     def packBits(self):
         """
@@ -246,7 +273,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -274,6 +301,57 @@ class Grid:
                 bools.append(False)
         return bools
 
+class GridColumn:
+    """
+    One column of a Grid: column[y] reads and writes bit x * height + y of the
+    grid's bitboard.  Indexing follows list rules (negative indices count from
+    the top, out of range raises IndexError).
+    """
+    __slots__ = ('grid', 'offset', 'height')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.height = grid.height
+        self.offset = x * grid.height
+
+    def __len__(self):
+        return self.height
+
+    def _bit(self, y):
+        if y < 0: y += self.height
+        if y < 0 or y >= self.height: raise IndexError('grid column index out of range')
+        return self.offset + y
+
+    def __getitem__(self, y):
+        if 0 <= y < self.height:
+            return (self.grid.bits >> (self.offset + y)) & 1 == 1
+        return (self.grid.bits >> self._bit(y)) & 1 == 1
+
+    def __setitem__(self, y, value):
+        mask = 1 << self._bit(y)
+        if value:
+            self.grid.bits |= mask
+        else:
+            self.grid.bits &= ~mask
+
+    def __iter__(self):
+        bits = self.grid.bits >> self.offset
+        for y in range(self.grid.height):
+            yield (bits >> y) & 1 == 1
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def count(self, item = True):
+        return list(self).count(item)
+
+def popcount(bits):
+    "Number of set bits of a non-negative int"
+    try:
+        return bits.bit_count()
+    except AttributeError:
+        return bin(bits).count('1')
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
@@ -370,21 +448,71 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
-class GameStateData:
+class ZobristKeys:
+    """
+    Random 64-bit keys for the Zobrist hash of GameStateData: one per (agent,
+    position, direction), (agent, scared timer), food cell and capsule.  Keys
+    are drawn on first use from a private generator, so hashing never touches
+    the global random state games and agents rely on.
     """
+    def __init__( self, seed = 20210701 ):
+        self.random = random.Random( seed )
+        self.keys = {}
+
+    def key( self, item ):
+        key = self.keys.get( item )
+        if key is None:
+            key = self.keys[item] = self.random.getrandbits( 64 )
+        return key
+
+    def agent( self, agentIndex, agentState ):
+        configuration = agentState.configuration
+        if configuration == None:
+            key = self.key( ( 'agent', agentIndex, None, None ) )
+        else:
+            key = self.key( ( 'agent', agentIndex, configuration.pos, configuration.direction ) )
+        return key ^ self.key( ( 'scared', agentIndex, agentState.scaredTimer ) )
+
+    def food( self, position ):
+        return self.key( ( 'food', position ) )
+
+    def capsule( self, position ):
+        return self.key( ( 'capsule', position ) )
 
+zobrist = ZobristKeys()
+
+class GameStateData:
+    """
+    Successors share the food grid, the capsule list and the agent states with
+    their predecessor (copy-on-write): only the objects a move actually changes
+    are copied, through getMutableAgentState, getMutableCapsules and
+    getMutableEaten.  Code that edits a state's data must go through those
+    accessors (or removeFood and removeCapsule) so the predecessor is left
+    untouched.
+
+    The hash is a Zobrist hash kept up to date as the state changes: a
+    successor starts from its predecessor's hash, the accessors XOR out the
+    keys of what is about to change, and the keys of the agents that changed
+    are XORed back in when the hash is read.
     """
     def __init__( self, prevState = None ):
         """
-        Generates a new data packet by copying information from its predecessor.
+        Generates a new data packet sharing the information of its predecessor.
         """
         if prevState != None:
-            self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            self.food = prevState.food
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates[:]
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+        # Which shared objects this data already owns a private copy of
+        self._ownedAgents = None
+        self._ownsCapsules = False
+        self._ownsEaten = False
+        # Zobrist hash of everything but the agents in _rehashAgents (None: not computed yet)
+        self._zobristBase = None if prevState == None else prevState.zobristHash()
+        self._rehashAgents = []
 
         self._foodEaten = None
         self._foodAdded = None
@@ -397,6 +525,12 @@ class GameStateData:
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
+        state.capsules = self.capsules[:]
+        state.agentStates = self.copyAgentStates( self.agentStates )
+        state._eaten = self._eaten[:]
+        state._ownedAgents = [True] * len( state.agentStates )
+        state._ownsCapsules = True
+        state._ownsEaten = True
         state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
@@ -404,12 +538,129 @@ class GameStateData:
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def pack( self ):
+        """
+        A compact, picklable copy of the state without the layout: the food
+        bits, capsules, score, win/lose flags and, per agent, whether it is
+        Pacman, its start and current position and direction and its scared
+        timer (numCarrying and numReturned are not kept; they are only used
+        in capture games).  See unpack.
+        """
+        agents = []
+        for agentState in self.agentStates:
+            start, configuration = agentState.start, agentState.configuration
+            agents.append( ( agentState.isPacman, start.pos, start.direction,
+                             configuration.pos, configuration.direction, agentState.scaredTimer ) )
+        return ( self.food.bits, tuple( self.capsules ), self.score, self._win, self._lose, tuple( agents ) )
+
+    def unpack( layout, packed ):
+        """
+        Rebuilds the GameStateData packed with pack() over its layout.
+        """
+        bits, capsules, score, win, lose, agents = packed
+        data = GameStateData()
+        data.layout = layout
+        data.food = Grid( layout.width, layout.height )
+        data.food.bits = bits
+        data.capsules = list( capsules )
+        data.score = score
+        data._win = win
+        data._lose = lose
+        data.agentStates = []
+        for isPacman, startPos, startDirection, pos, direction, scaredTimer in agents:
+            agentState = AgentState( Configuration( startPos, startDirection ), isPacman )
+            agentState.configuration = Configuration( pos, direction )
+            agentState.scaredTimer = scaredTimer
+            data.agentStates.append( agentState )
+        data._eaten = [False for a in data.agentStates]
+        data._ownedAgents = [True] * len( data.agentStates )
+        data._ownsCapsules = True
+        data._ownsEaten = True
+        data._zobristBase = data.computeZobristHash()
+        return data
+    unpack = staticmethod( unpack )
+
     def copyAgentStates( self, agentStates ):
         copiedStates = []
         for agentState in agentStates:
             copiedStates.append( agentState.copy() )
         return copiedStates
 
+    def getMutableAgentState( self, agentIndex ):
+        """
+        Returns the state of the agent, copying it first if it is still shared
+        with the predecessor.
+        """
+        owned = self._ownedAgents
+        if owned is None:
+            owned = self._ownedAgents = [False] * len( self.agentStates )
+        if not owned[agentIndex]:
+            agentState = self.agentStates[agentIndex]
+            if self._zobristBase != None:
+                self._zobristBase ^= zobrist.agent( agentIndex, agentState )
+                self._rehashAgents.append( agentIndex )
+            self.agentStates[agentIndex] = agentState.copy()
+            owned[agentIndex] = True
+        return self.agentStates[agentIndex]
+
+    def getMutableCapsules( self ):
+        """
+        Returns the capsule list, copying it first if it is still shared.
+        """
+        if not self._ownsCapsules:
+            self.capsules = self.capsules[:]
+            self._ownsCapsules = True
+        return self.capsules
+
+    def removeFood( self, position ):
+        """
+        Clears the food at position (on a private copy of the grid).
+        """
+        x, y = position
+        self.food = self.food.copy()
+        self.food[x][y] = False
+        if self._zobristBase != None:
+            self._zobristBase ^= zobrist.food( position )
+
+    def removeCapsule( self, position ):
+        self.getMutableCapsules().remove( position )
+        if self._zobristBase != None:
+            self._zobristBase ^= zobrist.capsule( position )
+
+    def zobristHash( self ):
+        """
+        Zobrist hash of the agents, food and capsules (the score is not included).
+        """
+        if self._zobristBase == None:
+            self._zobristBase = self.computeZobristHash()
+            self._rehashAgents = []
+        h = self._zobristBase
+        for agentIndex in self._rehashAgents:
+            h ^= zobrist.agent( agentIndex, self.agentStates[agentIndex] )
+        return h
+
+    def computeZobristHash( self ):
+        """
+        Zobrist hash computed from scratch.
+        """
+        h = 0
+        for agentIndex, agentState in enumerate( self.agentStates ):
+            h ^= zobrist.agent( agentIndex, agentState )
+        for position in self.food.asList():
+            h ^= zobrist.food( position )
+        for position in self.capsules:
+            h ^= zobrist.capsule( position )
+        return h
+
+    def getMutableEaten( self ):
+        """
+        Returns the list of ghosts eaten on this move, copying it first if it is still shared.
+        """
+        if not self._ownsEaten:
+            self._eaten = self._eaten[:]
+            self._ownsEaten = True
+        return self._eaten
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -426,17 +677,12 @@ class GameStateData:
         """
         Allows states to be keys of dictionaries.
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        return hash( ( self.zobristHash(), self.score ) )
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
+        # Characters of the board, as columns (a Grid only holds booleans)
+        map = [[' ' for y in range(height)] for x in range(width)]
         if type(self.food) == type((1,2)):
             self.food = reconstituteGrid(self.food)
         for x in range(width):
@@ -457,7 +703,9 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        out = [[map[x][y] for x in range(width)] for y in range(height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out]) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr( self, hasFood, hasWall ):
         if hasFood:
@@ -505,6 +753,11 @@ class GameStateData:
                 else: numGhosts += 1
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
         self._eaten = [False for a in self.agentStates]
+        self._ownedAgents = [True] * len( self.agentStates )
+        self._ownsCapsules = True
+        self._ownsEaten = True
+        self._zobristBase = self.computeZobristHash()
+        self._rehashAgents = []
 
 try:
     import boinc
@@ -248,10 +248,10 @@ class AlphaBetaGhost( GhostAgent ):
 def eval(gameState, agent, isScared):
     pac = gameState.getPacmanPosition()
     if agent != 0:
-        return manhattanDistance(gameState.getGhostPosition(agent), pac)
+        return gameState.getMazeDistance(gameState.getGhostPosition(agent), pac)
     else:
         closest = getClosestGhost(gameState)
-        return manhattanDistance(closest, pac)
+        return gameState.getMazeDistance(closest, pac)
 
 
 def getClosestGhost(state):
@@ -260,7 +260,7 @@ def getClosestGhost(state):
       pac = state.getPacmanPosition()
       ghostsPos = state.getGhostPositions()
       for index in range(len(ghostsPos)):
-          distances.append(manhattanDistance(pac, ghostsPos[index]))
+          distances.append(state.getMazeDistance(pac, ghostsPos[index]))
       return ghostsPos[distances.index(min(distances))]
 
 def isTerminal(gameState):
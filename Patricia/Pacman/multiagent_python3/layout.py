@@ -12,14 +12,20 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import math
 import os
 import random
+from collections import deque
 from functools import reduce
 
+import numpy as np
+
 from game import Directions, Grid
 from util import manhattanDistance
 
 VISIBILITY_MATRIX_CACHE = {}
+# MazeDistances by (width, height, wall bits), kept across games
+MAZE_DISTANCE_CACHE = {}
 
 class Layout:
     """
@@ -37,6 +43,7 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self.mazeDistances = None
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
@@ -47,7 +54,9 @@ class Layout:
         if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
             vecs = [(-0.5,0), (0.5,0),(0,-0.5),(0,0.5)]
             dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH:set(), Directions.SOUTH:set(), Directions.EAST:set(), Directions.WEST:set(), Directions.STOP:set()})
+            # Grid only holds booleans: the sets of visible positions live in plain columns
+            vis = [[dict((direction, set()) for direction in dirs + [Directions.STOP]) for y in range(self.height)]
+                   for x in range(self.width)]
             for x in range(self.width):
                 for y in range(self.height):
                     if self.walls[x][y] == False:
@@ -56,12 +65,24 @@ class Layout:
                             nextx, nexty = x + dx, y + dy
                             while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)] :
                                 vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
+                                nextx, nexty = nextx + dx, nexty + dy
             self.visibility = vis
             VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def getMazeDistances(self):
+        """
+        The MazeDistances of this layout's walls, shared by every layout (and
+        game) with the same walls.
+        """
+        if self.mazeDistances == None:
+            key = (self.width, self.height, self.walls.bits)
+            if key not in MAZE_DISTANCE_CACHE:
+                MAZE_DISTANCE_CACHE[key] = MazeDistances(self.walls)
+            self.mazeDistances = MAZE_DISTANCE_CACHE[key]
+        return self.mazeDistances
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -129,6 +150,70 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
+class MazeDistances:
+    """
+    Shortest path lengths through the maze between any two open cells.  The
+    table is a NumPy uint16 matrix over the open cells; the row of a cell is
+    filled by a breadth first search the first time a distance from it is
+    asked for, so a layout only pays for the cells actually used.
+    Unreachable cells are UNREACHABLE apart.
+    """
+    UNREACHABLE = int(np.iinfo(np.uint16).max)
+
+    def __init__(self, walls):
+        self.cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        self.index = dict((cell, i) for i, cell in enumerate(self.cells))
+        self.neighbors = []
+        for x, y in self.cells:
+            self.neighbors.append([self.index[cell] for cell in [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+                                   if cell in self.index])
+        self.matrix = np.full((len(self.cells), len(self.cells)), self.UNREACHABLE, dtype=np.uint16)
+        self.searched = np.zeros(len(self.cells), dtype=bool)
+
+    def row(self, source):
+        """
+        Distances from the cell with index source to every cell, by index.
+        """
+        if not self.searched[source]:
+            distances = [self.UNREACHABLE] * len(self.cells)
+            distances[source] = 0
+            frontier = deque([source])
+            neighbors = self.neighbors
+            while frontier:
+                cell = frontier.popleft()
+                distance = distances[cell] + 1
+                for neighbor in neighbors[cell]:
+                    if distances[neighbor] == self.UNREACHABLE:
+                        distances[neighbor] = distance
+                        frontier.append(neighbor)
+            self.matrix[source] = distances
+            self.searched[source] = True
+        return self.matrix[source]
+
+    def distance(self, pos1, pos2):
+        """
+        Maze distance between two positions.  A position between two cells (a
+        scared ghost moves half a cell per turn) is measured through the
+        nearer of the two.
+        """
+        cells1, cells2 = self.nearCells(pos1), self.nearCells(pos2)
+        if len(cells1) == 1 and len(cells2) == 1:
+            return int(self.row(cells1[0][0])[cells2[0][0]])
+        return min(int(self.row(i)[j]) + offset1 + offset2
+                   for i, offset1 in cells1 for j, offset2 in cells2)
+
+    def nearCells(self, pos):
+        """
+        The (cell index, distance to it) of the open cells a position is on or between.
+        """
+        x, y = pos
+        cell = self.index.get((x, y))
+        if cell != None:
+            return [(cell, 0)]
+        below = (int(math.floor(x)), int(math.floor(y)))
+        above = (int(math.ceil(x)), int(math.ceil(y)))
+        return [(self.index[cell], abs(x - cell[0]) + abs(y - cell[1])) for cell in [below, above] if cell in self.index]
+
 def getLayout(name, back = 2):
     if name.endswith('.lay'):
         layout = tryToLoad('layouts/' + name)
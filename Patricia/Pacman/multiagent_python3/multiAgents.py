@@ -12,11 +12,16 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import copy
+import math
+import multiprocessing
+import os
 import random
 import sys
+import time
 
 import util
-from game import Agent, Directions
+from game import Actions, Agent, Directions
 from util import manhattanDistance, norm
 import numpy as np
 
@@ -84,8 +89,8 @@ class ReflexAgent(Agent):
                    newPos, successorGameState, ghostsPos):
       """Busca se afastar do fantasma mais próximo"""
       
-      closest = self.closestGhost(newPos, ghostsPos)
-      return manhattanDistance(closest, newPos)
+      closest = self.closestGhost(successorGameState, newPos, ghostsPos)
+      return successorGameState.getMazeDistance(closest, newPos)
       
     def foodScore(self, currentGameState, action, newPos, successorGameState,
                   ghostsPos, newScaredTimes):
@@ -95,8 +100,8 @@ class ReflexAgent(Agent):
       actualPos = currentGameState.getPacmanPosition()
       closestFood = self.closestFood(currentGameState, successorGameState, 
                                      newScaredTimes)
-      isBetterPos = (manhattanDistance(closestFood, newPos) < 
-                    manhattanDistance(closestFood, actualPos))
+      isBetterPos = (currentGameState.getMazeDistance(closestFood, newPos) < 
+                    currentGameState.getMazeDistance(closestFood, actualPos))
       return 1 if isBetterPos else 0
 
 
@@ -113,13 +118,13 @@ class ReflexAgent(Agent):
       foodPos = foodPos + ghostsPos if isScaredTimer else foodPos
 
       # Calcula distâncias
-      pacman_distance = [manhattanDistance(f, actualPos) for f in foodPos]
-      ghost_distance = [self.foodDistanceGhosts(f, ghostsPos) for f in foodPos] 
+      pacman_distance = [currentGameState.getMazeDistance(f, actualPos) for f in foodPos]
+      ghost_distance = [self.foodDistanceGhosts(successorGameState, f, ghostsPos) for f in foodPos] 
       
       # Obtém o objetivo da próxima ação
       if isScaredTimer:
             # Se existir algum fantasma assustado persegue-o
-            closest = self.closestGhost(actualPos,  ghostsPos, newScaredTimes)
+            closest = self.closestGhost(successorGameState, actualPos,  ghostsPos, newScaredTimes)
       else:
             # Se não, busca a comida mais próxima do pacman e distante do fantasma
             total = list(np.array(pacman_distance) - np.array(ghost_distance))
@@ -127,11 +132,11 @@ class ReflexAgent(Agent):
       
       return closest
 
-    def closestGhost(self, newPos, ghostsPos, ghostScaredTimer=None):
+    def closestGhost(self, gameState, newPos, ghostsPos, ghostScaredTimer=None):
       distances = []
       for index in range(len(ghostsPos)):
         if not ghostScaredTimer or ghostScaredTimer[index] > 0:
-          distances.append(manhattanDistance(newPos, ghostsPos[index]))
+          distances.append(gameState.getMazeDistance(newPos, ghostsPos[index]))
       return ghostsPos[distances.index(min(distances))]
     
     def ghostNorm(self, currentGameState, legalMoves):
@@ -141,7 +146,7 @@ class ReflexAgent(Agent):
         newPos = successorGameState.getPacmanPosition()
         ghostsPos = successorGameState.getGhostPositions()
         for index in range(len(ghostsPos)):
-          d = manhattanDistance(newPos, ghostsPos[index])
+          d = successorGameState.getMazeDistance(newPos, ghostsPos[index])
           if d > distant:
             distant = d
       
@@ -151,12 +156,12 @@ class ReflexAgent(Agent):
     def anyScaredTimer(self, newScaredTimes):
       return sum(newScaredTimes) > 0
 
-    def foodDistanceGhosts(self, foodPos, ghostsPos):
-      dist = [manhattanDistance(foodPos, ghostPos) for ghostPos in ghostsPos]
+    def foodDistanceGhosts(self, gameState, foodPos, ghostsPos):
+      dist = [gameState.getMazeDistance(foodPos, ghostPos) for ghostPos in ghostsPos]
       return sum(dist)/len(dist)
 
-    def foodDistanceClosestGhosts(self, foodPos, ghostsPos):
-      return min([manhattanDistance(foodPos, ghostPos) for ghostPos in ghostsPos])
+    def foodDistanceClosestGhosts(self, gameState, foodPos, ghostsPos):
+      return min([gameState.getMazeDistance(foodPos, ghostPos) for ghostPos in ghostsPos])
 
 def scoreEvaluationFunction(currentGameState):
     """
@@ -168,7 +173,40 @@ def scoreEvaluationFunction(currentGameState):
     """
     return currentGameState.getScore()
 
-class MultiAgentSearchAgent(Agent):
+def sameMaze(layout, other):
+    """
+      Whether two layouts have the same walls.  Agents get a deep copy of the
+      game state every move, layout included, so whatever an agent builds
+      for a layout is checked against the walls, not the layout object.
+    """
+    return layout is not None and other is not None and layout.walls == other.walls
+
+class MoveBudget:
+    """
+      Time budget per move for agents that search against the clock.  The
+      agent sets self.timeBudget from its -a options: seconds, or 'auto' for
+      half of the game's move timeout (ClassicGameRules.newGame tells it
+      through setMoveTimeout).
+    """
+    moveTimeout = None
+    timeBudget = '0'
+
+    def setMoveTimeout(self, seconds):
+        """
+          Called by ClassicGameRules.newGame with the time the agent has for
+          each move; agents that search against the clock budget from it.
+        """
+        self.moveTimeout = seconds
+
+    def getBudget(self):
+        """
+          Seconds the search may take per move (0: no time limit).
+        """
+        if self.timeBudget == 'auto':
+          return 0.5 * self.moveTimeout if self.moveTimeout else 1.0
+        return float(self.timeBudget)
+
+class MultiAgentSearchAgent(MoveBudget, Agent):
     """
       This class provides some common elements to all of your
       multi-agent searchers.  Any methods defined here will be available
@@ -183,10 +221,206 @@ class MultiAgentSearchAgent(Agent):
       is another abstract class.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'):
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', transpositionTable = '0',
+                 iterativeDeepening = '0', maxDepth = '50', workers = '0'):
         self.index = 0 # Pacman is always agent index 0
         self.evaluationFunction = util.lookup(evalFn, globals())
         self.depth = int(depth)
+        # Optional transposition table (-a transpositionTable=N keeps up to N
+        # entries across turns); 0 searches without one
+        entries = int(transpositionTable)
+        self.transpositionTable = util.TranspositionTable(entries) if entries > 0 else None
+        # Optional time budget per move (-a iterativeDeepening=SECONDS, or
+        # =auto for half of the game's move timeout); 0 searches to self.depth
+        self.timeBudget = iterativeDeepening
+        self.maxDepth = int(maxDepth)
+        # SearchClock of the running iteration (None when searching to a fixed depth)
+        self.clock = None
+        self.searchedDepth = 0
+        # Optional root-parallel search over -a workers=N processes (see rootSplit)
+        self.workers = int(workers)
+        if self.workers > 0 and 'fork' not in multiprocessing.get_all_start_methods():
+            raise Exception("workers needs processes started with fork, which this platform does not support")
+        self.pool = RootSplitPool(self, self.workers) if self.workers > 0 else None
+        if self.pool is not None and self.getBudget() > 0:
+            raise Exception("workers can only be used with a fixed depth, not with iterativeDeepening")
+
+    def tableKey(self, gameState, depth, agent):
+        """
+          Transposition table key of a node depth plies from the root, or None
+          when the agent searches without a table.
+        """
+        if self.transpositionTable is None:
+            return None
+        return self.transpositionTable.key(gameState, self.depth - depth, agent)
+
+    def final(self, gameState):
+        if self.transpositionTable is not None:
+            print('Transposition table:', self.transpositionTable)
+        if self.pool is not None:
+            self.pool.close()
+
+    def rootSplit(self, gameState):
+        """
+          Root-parallel search (young brothers wait): the first root move is
+          searched here for a bound, then the other root moves are searched at
+          the same time by the worker processes, with that bound as alpha.
+          Returns (score, action) as the serial search at the root would.
+        """
+        legalMoves = gameState.getLegalActions(self.index)
+        bestAction = legalMoves[0]
+        successorGameState = gameState.generateSuccessor(self.index, bestAction)
+        bestScore = self.searchChild(successorGameState, -float("inf"), float("inf"))
+        if len(legalMoves) > 1:
+          scores = self.pool.search(gameState, legalMoves[1:], bestScore, float("inf"))
+          for action, score in zip(legalMoves[1:], scores):
+            if score > bestScore:
+              bestScore = score
+              bestAction = action
+        return (bestScore, bestAction)
+
+    def deepen(self, search, budget):
+        """
+          Iterative deepening: calls search() with self.depth set to 1, 2, ...
+          up to maxDepth and returns the action of the deepest search that
+          finished before the deadline.  The first iteration always finishes,
+          and no new iteration starts once half of the budget is spent, since
+          it would most likely be cut short.
+        """
+        start = time.perf_counter()
+        deadline = start + budget
+        fixedDepth = self.depth
+        bestAction = None
+        try:
+          for depth in range(1, self.maxDepth + 1):
+            self.depth = depth
+            self.clock = SearchClock(None if depth == 1 else deadline)
+            try:
+              score, action = search()
+            except SearchTimeout:
+              break
+            bestAction = action
+            self.searchedDepth = depth
+            if time.perf_counter() - start > budget / 2:
+              break
+        finally:
+          self.depth = fixedDepth
+          self.clock = None
+        return bestAction
+
+class RootSplitPool:
+    """
+      Worker processes for MultiAgentSearchAgent.rootSplit.  Each worker gets
+      a copy of the agent and the layout once, when the pool starts, so a task
+      only carries the packed root state (GameState.pack), one root move and
+      the window.  The workers are forked, so the agent and its evaluation
+      function never need to be pickled; states they generate are not counted
+      by the explored policy of the parent process.
+    """
+    def __init__(self, agent, workers):
+        self.agent = agent
+        self.workers = workers
+        self.pool = None
+        self.layout = None
+
+    def search(self, gameState, actions, alpha, beta):
+        """
+          Returns the values of the root moves in actions, searched in parallel
+          with the window (alpha, beta).
+        """
+        layout = gameState.data.layout
+        if self.pool is None or not sameMaze(self.layout, layout):
+          self.close()
+          worker = copy.copy(self.agent)
+          worker.workers = 0
+          worker.pool = None
+          context = multiprocessing.get_context('fork')
+          self.pool = context.Pool(self.workers, startRootWorker, (worker, layout, type(gameState)))
+          self.layout = layout
+        packed = gameState.pack()
+        return self.pool.starmap(searchRootMove, [(packed, action, alpha, beta) for action in actions], chunksize=1)
+
+    def close(self):
+        if self.pool is not None:
+          self.pool.terminate()
+          self.pool = None
+          self.layout = None
+
+# (agent, layout, GameState class) of a root-split worker process
+rootWorker = None
+
+def startRootWorker(agent, layout, stateClass):
+    global rootWorker
+    stateClass.setExploredPolicy('off')
+    if hasattr(agent, 'random'):
+      # Forked workers start from the parent's generator state: give each its own sequence
+      agent.random = random.Random((agent.random.getrandbits(32) << 32) + os.getpid())
+    rootWorker = (agent, layout, stateClass)
+
+def searchRootMove(packed, action, alpha, beta):
+    agent, layout, stateClass = rootWorker
+    gameState = stateClass.unpack(layout, packed)
+    return agent.searchChild(gameState.generateSuccessor(agent.index, action), alpha, beta)
+
+class SearchTimeout(Exception):
+    """
+      Raised inside a search when its time budget runs out.
+    """
+    pass
+
+class SearchClock:
+    """
+      Deadline of one search iteration.  The search calls tick() at every
+      node; it raises SearchTimeout once the deadline has passed (the clock is
+      only read every few hundred nodes).
+    """
+    CHECK_EVERY = 256
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.nodes = 0
+
+    def tick(self):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % self.CHECK_EVERY == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+class MoveOrdering:
+    """
+      Move ordering for iterative deepening.  Moves are tried
+        1. the best move found for the same state by the previous iteration
+           (this includes the principal variation),
+        2. the killer moves of the ply (the last two moves that caused a cutoff there),
+        3. the rest, by history score (how much each agent's move caused cutoffs).
+    """
+    def __init__(self):
+        self.bestMoves = {}
+        self.previousBestMoves = {}
+        self.killers = {}
+        self.history = util.Counter()
+
+    def startIteration(self):
+        self.previousBestMoves = self.bestMoves
+        self.bestMoves = {}
+
+    def order(self, gameState, agent, ply, legalMoves):
+        bestMove = self.previousBestMoves.get((hash(gameState), agent))
+        killers = self.killers.get(ply, ())
+        history = self.history
+        def priority(action):
+            if action == bestMove: return (0, 0)
+            if action in killers: return (1, killers.index(action))
+            return (2, -history[(agent, action)])
+        return sorted(legalMoves, key=priority)
+
+    def remember(self, gameState, agent, action):
+        self.bestMoves[(hash(gameState), agent)] = action
+
+    def cutoff(self, agent, ply, action, remaining):
+        killers = self.killers.get(ply, ())
+        if action not in killers:
+            self.killers[ply] = (action,) + killers[:1]
+        self.history[(agent, action)] += remaining * remaining
 
 class MinimaxAgent(MultiAgentSearchAgent):
     """
@@ -216,8 +450,21 @@ class MinimaxAgent(MultiAgentSearchAgent):
 class AlphaBetaAgent(MultiAgentSearchAgent):
     """
       Your minimax agent with alpha-beta pruning (question 3)
+
+      With -a iterativeDeepening=SECONDS (or =auto, half of the game's move
+      timeout) the agent searches depth 1, 2, ... up to maxDepth with move
+      ordering (see MoveOrdering) and plays the move of the deepest search
+      that finished within the budget; self.depth is not used then.
+
+      With -a workers=N the root moves are searched by N processes at a fixed
+      depth (see MultiAgentSearchAgent.rootSplit).
     """
 
+    def __init__(self, *args, **kwargs):
+        MultiAgentSearchAgent.__init__(self, *args, **kwargs)
+        # MoveOrdering of the current iterative deepening search (None for fixed depth)
+        self.ordering = None
+
     def getAction(self, gameState):
         """
           Returns the minimax action using self.depth and self.evaluationFunction
@@ -226,6 +473,12 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         if '--ghost' in sys.argv:
           return random.choice(gameState.getLegalActions())
 
+        if self.getBudget() > 0:
+          return self.deepeningSearch(gameState, self.getBudget())
+
+        if self.pool is not None:
+          return self.rootSplit(gameState)[1]
+
         alpha = -float("inf")
         beta = float("inf")
         depth = 0
@@ -233,15 +486,62 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         
         return action
 
+    def searchChild(self, gameState, alpha, beta):
+        """
+          Value of a successor of the root, searched with the window (alpha, beta).
+        """
+        return self.minMax(gameState, 0, alpha, beta, self.index + 1)[0]
+
+    def deepeningSearch(self, gameState, budget):
+        """
+          Iterative deepening (see deepen) with move ordering.
+        """
+        ordering = self.ordering = MoveOrdering()
+        def search():
+          ordering.startIteration()
+          return self.minMax(gameState, 0, -float("inf"), float("inf"), self.index)
+        try:
+          return self.deepen(search, budget)
+        finally:
+          self.ordering = None
+
     def minMax(self, gameState, depth, alpha, beta, agent=0):
         agent, depth = self.getAgent(gameState, agent, depth)
         if self.isTerminal(gameState) or depth == self.depth:
             return (self.evaluationFunction(gameState), "Stop")
 
+        ordering = self.ordering
+        if self.clock is not None:
+          self.clock.tick()
+
+        legalMoves = gameState.getLegalActions(agent)
+
+        # Transposition table: exact values are reused, bounds narrow the window
+        key = self.tableKey(gameState, depth, agent)
+        windowAlpha, windowBeta = alpha, beta
+        if key is not None:
+          entry = self.transpositionTable.lookup(key)
+          if entry is not None:
+            value, bound, tableAction = entry
+            if bound == util.TranspositionTable.EXACT:
+              return (value, tableAction)
+            if bound == util.TranspositionTable.LOWER:
+              alpha = max(alpha, value)
+            else:
+              beta = min(beta, value)
+            if alpha >= beta:
+              return (value, tableAction)
+            # Below the root, try the stored best action first
+            if ordering is None and (depth, agent) != (0, self.index) and tableAction in legalMoves:
+              legalMoves = [tableAction] + [action for action in legalMoves if action != tableAction]
+
+        if ordering is not None:
+          ply = depth * gameState.getNumAgents() + agent
+          legalMoves = ordering.order(gameState, agent, ply, legalMoves)
+
         bestScore = -float("inf") if agent == 0 else float("inf")
         bestAction = "Stop"
 
-        legalMoves = gameState.getLegalActions(agent)
         for action in legalMoves:
           successorGameState = gameState.generateSuccessor(agentIndex=agent, action=action)
           newState =  self.minMax(successorGameState, depth, alpha, beta, agent+1)
@@ -251,7 +551,9 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
               bestScore = newState[0]
               bestAction = action
             if bestScore > beta:
-              return (bestScore, action)
+              if ordering is not None:
+                ordering.cutoff(agent, ply, action, self.depth - depth)
+              return self.remember(key, bestScore, action, windowAlpha, windowBeta, gameState, agent)
             alpha = max(alpha, newState[0])
 
           else: #MIN
@@ -259,10 +561,30 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
                 bestScore = newState[0]
                 bestAction = action
             if bestScore < alpha:
-              return (bestScore, action)
+              if ordering is not None:
+                ordering.cutoff(agent, ply, action, self.depth - depth)
+              return self.remember(key, bestScore, action, windowAlpha, windowBeta, gameState, agent)
             beta = min(beta, newState[0])
 
-        return (bestScore, bestAction)
+        return self.remember(key, bestScore, bestAction, windowAlpha, windowBeta, gameState, agent)
+
+    def remember(self, key, score, action, alpha, beta, gameState, agent):
+      """
+        Stores a result searched with the window (alpha, beta) in the
+        transposition table (if any) and, while deepening, as the best move
+        of the state for the next iteration.  Returns the result.
+      """
+      if self.ordering is not None:
+        self.ordering.remember(gameState, agent, action)
+      if key is not None:
+        if score <= alpha:
+          bound = util.TranspositionTable.UPPER
+        elif score >= beta:
+          bound = util.TranspositionTable.LOWER
+        else:
+          bound = util.TranspositionTable.EXACT
+        self.transpositionTable.store(key, score, bound, action)
+      return (score, action)
 
     def isTerminal(self, gameState):
       return gameState.isWin() or gameState.isLose()
@@ -276,8 +598,32 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
       Your expectimax agent (question 4)
+
+      Anytime options (all off by default):
+        -a iterativeDeepening=SECONDS (or =auto) searches depth 1, 2, ... up
+           to maxDepth and plays the move of the deepest search that finished
+           within the budget, as AlphaBetaAgent does.
+        -a samples=K averages each chance node over K of the ghost's moves,
+           drawn at random (seed=N), instead of all of them.
+        -a minValue=LO,maxValue=HI bounds the evaluation function (values
+           outside are clamped), which lets chance nodes be cut off once their
+           average can no longer change the choice above them (Star1).
+        -a workers=N searches the root moves in N processes at a fixed depth
+           (see MultiAgentSearchAgent.rootSplit; each worker draws its own samples).
+      With sampling or bounds the search runs in expectimax, which does not
+      use the transposition table.
     """
 
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', transpositionTable = '0',
+                 iterativeDeepening = '0', maxDepth = '50', workers = '0', samples = '0',
+                 minValue = None, maxValue = None, seed = '0'):
+        MultiAgentSearchAgent.__init__(self, evalFn, depth, transpositionTable, iterativeDeepening, maxDepth, workers)
+        self.samples = int(samples)
+        if (minValue is None) != (maxValue is None):
+          raise Exception("ExpectimaxAgent needs both minValue and maxValue")
+        self.valueRange = None if minValue is None else (float(minValue), float(maxValue))
+        self.random = random.Random(int(seed))
+
     def getAction(self, gameState):
         """
           Returns the minimax action using self.depth and self.evaluationFunction
@@ -287,15 +633,45 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         if '--ghost' in sys.argv:
           return random.choice(gameState.getLegalActions())
 
-        depth = 0
-        score, action = self.minMax(gameState, depth, self.index)
+        if self.getBudget() > 0:
+          return self.deepen(lambda: self.search(gameState), self.getBudget())
+
+        if self.pool is not None:
+          return self.rootSplit(gameState)[1]
+
+        score, action = self.search(gameState)
 
         return action
 
+    def search(self, gameState):
+        """
+          Searches gameState to self.depth and returns (score, action).
+        """
+        if self.samples > 0 or self.valueRange is not None:
+          return self.expectimax(gameState, 0, self.index, -float("inf"), float("inf"))
+        return self.minMax(gameState, 0, self.index)
+
+    def searchChild(self, gameState, alpha, beta):
+        """
+          Value of a successor of the root; the window only matters for expectimax.
+        """
+        if self.samples > 0 or self.valueRange is not None:
+          return self.expectimax(gameState, 0, self.index + 1, alpha, beta)[0]
+        return self.minMax(gameState, 0, self.index + 1)[0]
+
     def minMax(self, gameState, depth, agent=0):
         agent, depth = self.getAgent(gameState, agent, depth)
         if self.isTerminal(gameState) or depth == self.depth:
             return (self.evaluationFunction(gameState), "Stop")
+        if self.clock is not None:
+          self.clock.tick()
+
+        # Expectimax values are always exact, so a table hit ends the search here
+        key = self.tableKey(gameState, depth, agent)
+        if key is not None:
+          entry = self.transpositionTable.lookup(key)
+          if entry is not None:
+            return (entry[0], entry[2])
 
         bestScore = -float("inf") if agent == 0 else 0
         bestAction = "Stop"
@@ -315,8 +691,67 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
             bestScore += newState[0]*prob #UTILIDADE ESPERADA
             bestAction = action
 
+        if key is not None:
+          self.transpositionTable.store(key, bestScore, util.TranspositionTable.EXACT, bestAction)
         return (bestScore, bestAction)
 
+    def expectimax(self, gameState, depth, agent, alpha, beta):
+        """
+          Expectimax with optional chance node sampling and Star1 pruning.
+          Values are fail-soft within (alpha, beta): a result <= alpha is an
+          upper bound and one >= beta a lower bound of the true value.
+        """
+        agent, depth = self.getAgent(gameState, agent, depth)
+        if self.isTerminal(gameState) or depth == self.depth:
+            score = self.evaluationFunction(gameState)
+            if self.valueRange is not None:
+              score = min(max(score, self.valueRange[0]), self.valueRange[1])
+            return (score, "Stop")
+        if self.clock is not None:
+          self.clock.tick()
+
+        legalMoves = gameState.getLegalActions(agent)
+
+        if agent == 0: #MAX
+          bestScore = -float("inf")
+          bestAction = "Stop"
+          for action in legalMoves:
+            successorGameState = gameState.generateSuccessor(agentIndex=agent, action=action)
+            score = self.expectimax(successorGameState, depth, agent+1, max(alpha, bestScore), beta)[0]
+            if score > bestScore:
+              bestScore = score
+              bestAction = action
+            if bestScore >= beta:
+              break
+          return (bestScore, bestAction)
+
+        #Expect
+        if self.samples > 0 and len(legalMoves) > self.samples:
+          legalMoves = self.random.sample(legalMoves, self.samples)
+        n = len(legalMoves)
+        total = 0
+        for i, action in enumerate(legalMoves):
+          successorGameState = gameState.generateSuccessor(agentIndex=agent, action=action)
+          if self.valueRange is None:
+            total += self.expectimax(successorGameState, depth, agent+1, -float("inf"), float("inf"))[0]
+            continue
+
+          # Star1: the moves not searched yet are worth between lo and hi, so
+          # this child only matters inside the window that can still move the
+          # average across (alpha, beta)
+          lo, hi = self.valueRange
+          rest = n - i - 1
+          childAlpha = max(lo, n * alpha - total - rest * hi)
+          childBeta = min(hi, n * beta - total - rest * lo)
+          total += self.expectimax(successorGameState, depth, agent+1, childAlpha, childBeta)[0]
+          upper = (total + rest * hi) / n
+          if upper <= alpha:
+            return (upper, action)
+          lower = (total + rest * lo) / n
+          if lower >= beta:
+            return (lower, action)
+        return (total / n, action)
+
     def isTerminal(self, gameState):
       return gameState.isWin() or gameState.isLose()
 
@@ -326,6 +761,361 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
       return agent, depth
 
 
+class RolloutBoard:
+    """
+      The moves available from each cell of a layout, computed on first use.
+      Shared by all the RolloutStates of a game.
+    """
+    def __init__(self, layout):
+        self.layout = layout
+        self.walls = layout.walls
+        self.height = layout.height
+        self.cellMoves = {}
+
+    def moves(self, x, y):
+        """
+          Directions (Stop included) that do not run into a wall from cell (x, y).
+        """
+        moves = self.cellMoves.get((x, y))
+        if moves is None:
+          walls = self.walls
+          moves = self.cellMoves[(x, y)] = [direction for direction, (dx, dy) in Actions._directionsAsList
+                                             if not walls[x + dx][y + dy]]
+        return moves
+
+class RolloutState:
+    """
+      A light copy of a GameState for Monte Carlo rollouts: agent positions,
+      directions and scared timers, the food bitboard, capsules and score in
+      plain lists and ints, moved in place by step() under the classic rules
+      of pacman.py (PacmanRules and GhostRules).  Copying one is a few list
+      copies instead of a GameState successor.
+    """
+    # As in pacman.py
+    SCARED_TIME = 40
+    COLLISION_TOLERANCE = 0.7
+    TIME_PENALTY = 1
+
+    __slots__ = ('board', 'starts', 'positions', 'directions', 'scared',
+                 'food', 'foodCount', 'capsules', 'score', 'win', 'lose')
+
+    def fromGameState(gameState, board):
+        data = gameState.data
+        state = RolloutState()
+        state.board = board
+        state.starts = [(agentState.start.pos, agentState.start.direction) for agentState in data.agentStates]
+        state.positions = [agentState.configuration.pos for agentState in data.agentStates]
+        state.directions = [agentState.configuration.direction for agentState in data.agentStates]
+        state.scared = [agentState.scaredTimer for agentState in data.agentStates]
+        state.food = data.food.bits
+        state.foodCount = data.food.count()
+        state.capsules = list(data.capsules)
+        state.score = data.score
+        state.win = data._win
+        state.lose = data._lose
+        return state
+    fromGameState = staticmethod(fromGameState)
+
+    def copy(self):
+        state = RolloutState()
+        state.board = self.board
+        state.starts = self.starts
+        state.positions = self.positions[:]
+        state.directions = self.directions[:]
+        state.scared = self.scared[:]
+        state.food = self.food
+        state.foodCount = self.foodCount
+        state.capsules = self.capsules[:]
+        state.score = self.score
+        state.win = self.win
+        state.lose = self.lose
+        return state
+
+    def key(self):
+        """
+          Hashable summary of the state, equal for equal GameStates.
+        """
+        return (tuple(self.positions), tuple(self.directions), tuple(self.scared),
+                self.food, tuple(self.capsules), self.score)
+
+    def isOver(self):
+        return self.win or self.lose
+
+    def legalActions(self, agent):
+        x, y = self.positions[agent]
+        xInt, yInt = int(x + 0.5), int(y + 0.5)
+        # In between grid points, all agents must continue straight
+        if abs(x - xInt) + abs(y - yInt) > Actions.TOLERANCE:
+          return [self.directions[agent]]
+        moves = self.board.moves(xInt, yInt)
+        if agent == 0:
+          return moves
+        # Ghosts cannot stop, and only turn around at dead ends
+        moves = [direction for direction in moves if direction != Directions.STOP]
+        reverse = Actions.reverseDirection(self.directions[agent])
+        if reverse in moves and len(moves) > 1:
+          moves.remove(reverse)
+        return moves
+
+    def step(self, agent, action):
+        """
+          Moves agent by action, as GameState.generateSuccessor does.
+        """
+        speed = 0.5 if agent > 0 and self.scared[agent] > 0 else 1.0
+        dx, dy = Actions.directionToVector(action, speed)
+        x, y = self.positions[agent]
+        position = self.positions[agent] = (x + dx, y + dy)
+        if action != Directions.STOP:
+          self.directions[agent] = action
+
+        if agent == 0:
+          nearest = util.nearestPoint(position)
+          if manhattanDistance(nearest, position) <= 0.5:
+            self.consume(nearest)
+          self.score -= self.TIME_PENALTY
+          for ghost in range(1, len(self.positions)):
+            self.checkDeath(ghost)
+        else:
+          timer = self.scared[agent]
+          if timer == 1:
+            self.positions[agent] = util.nearestPoint(position)
+          self.scared[agent] = max(0, timer - 1)
+          self.checkDeath(agent)
+
+    def consume(self, position):
+        x, y = position
+        bit = 1 << (x * self.board.height + y)
+        if self.food & bit:
+          self.food &= ~bit
+          self.foodCount -= 1
+          self.score += 10
+          if self.foodCount == 0 and not self.lose:
+            self.score += 500
+            self.win = True
+        if position in self.capsules:
+          self.capsules.remove(position)
+          for ghost in range(1, len(self.scared)):
+            self.scared[ghost] = self.SCARED_TIME
+
+    def checkDeath(self, ghost):
+        if manhattanDistance(self.positions[ghost], self.positions[0]) > self.COLLISION_TOLERANCE:
+          return
+        if self.scared[ghost] > 0:
+          self.score += 200
+          self.positions[ghost], self.directions[ghost] = self.starts[ghost]
+          self.scared[ghost] = 0
+        elif not self.win:
+          self.score -= 500
+          self.lose = True
+
+def randomGhostDistribution(state, ghost, legalActions):
+    """
+      RandomGhost: every legal action is equally likely.
+    """
+    return [1.0 / len(legalActions)] * len(legalActions)
+
+def directionalGhostDistribution(state, ghost, legalActions, attack=0.8, flee=0.8):
+    """
+      DirectionalGhost: rushes Pacman (or flees when scared) with probability
+      0.8, any legal action otherwise.
+    """
+    isScared = state.scared[ghost] > 0
+    speed = 0.5 if isScared else 1.0
+    x, y = state.positions[ghost]
+    pacmanPosition = state.positions[0]
+    distances = []
+    for action in legalActions:
+      dx, dy = Actions.directionToVector(action, speed)
+      distances.append(manhattanDistance((x + dx, y + dy), pacmanPosition))
+    if isScared:
+      bestDistance, bestProb = max(distances), flee
+    else:
+      bestDistance, bestProb = min(distances), attack
+    bestCount = distances.count(bestDistance)
+    return [(bestProb / bestCount if distance == bestDistance else 0) + (1 - bestProb) / len(legalActions)
+            for distance in distances]
+
+# Ghost models for MonteCarloAgent (-a ghostPolicy=name)
+GHOST_POLICIES = {
+    'random': randomGhostDistribution,
+    'directional': directionalGhostDistribution,
+}
+
+class MonteCarloNode:
+    """
+      A state of the search tree with Pacman to move.  For each action tried
+      there, edges holds [visits, total value, outcomes], where outcomes maps
+      the key of each state reached after the ghosts replied to its node.
+    """
+    def __init__(self, state):
+        self.state = state
+        self.visits = 0
+        self.edges = {}
+
+class MonteCarloAgent(MoveBudget, Agent):
+    """
+      Monte Carlo tree search (UCT) for Pacman.
+
+      Each simulation walks down the tree choosing Pacman's moves by UCB1 and
+      the ghosts' moves from the ghost model, adds the first state reached
+      that is not in the tree yet, and plays a random game from it (Pacman
+      moves at random, ghosts by the model) for at most rolloutDepth Pacman
+      moves.  The score at the end is the value backed up the tree.  Both
+      the tree and the rollouts run on RolloutStates, not GameStates.
+
+      Options (-a key=value):
+        simulations   simulations per move (0: until the time budget runs out)
+        timeBudget    seconds per move, or auto for half of the game's move
+                      timeout (0: no time limit)
+        exploration   UCB1 exploration constant, over values scaled to [0, 1]
+        rolloutDepth  Pacman moves per rollout
+        ghostPolicy   ghost model: random (the default RandomGhost) or
+                      directional (DirectionalGhost), see GHOST_POLICIES
+        reuseTree     1 to keep the subtree of the state reached between turns
+        seed          seed of the agent's own random generator
+      The move played is the one simulated most often.
+    """
+
+    def __init__(self, simulations = '100', timeBudget = '0', exploration = '1.4', rolloutDepth = '10',
+                 ghostPolicy = 'random', reuseTree = '1', seed = '0'):
+        self.index = 0
+        self.simulations = int(simulations)
+        self.timeBudget = timeBudget
+        self.exploration = float(exploration)
+        self.rolloutDepth = int(rolloutDepth)
+        if ghostPolicy not in GHOST_POLICIES:
+          raise Exception('Unknown ghost policy %s, expected one of %s' % (ghostPolicy, sorted(GHOST_POLICIES)))
+        self.ghostDistribution = GHOST_POLICIES[ghostPolicy]
+        self.reuseTree = reuseTree == '1'
+        self.random = random.Random(int(seed))
+        self.board = None
+        self.root = None
+        self.lastAction = None
+        # Smallest and largest value backed up in the current search (for UCB1)
+        self.low = self.high = 0
+        if self.simulations <= 0 and self.getBudget() <= 0:
+          raise Exception("MonteCarloAgent needs simulations or a timeBudget")
+
+    def getAction(self, gameState):
+        if self.board is None or not sameMaze(self.board.layout, gameState.data.layout):
+          self.board = RolloutBoard(gameState.data.layout)
+          self.root = None
+        root = self.findRoot(RolloutState.fromGameState(gameState, self.board))
+
+        budget = self.getBudget()
+        deadline = time.perf_counter() + budget if budget > 0 else None
+        self.low = self.high = root.state.score
+        simulations = 0
+        while self.simulations <= 0 or simulations < self.simulations:
+          self.simulate(root)
+          simulations += 1
+          if deadline is not None and time.perf_counter() > deadline:
+            break
+
+        action = max(root.edges, key=lambda action: (root.edges[action][0], root.edges[action][1] / root.edges[action][0]))
+        self.root = root
+        self.lastAction = action
+        return action
+
+    def findRoot(self, state):
+        """
+          The node of state in the tree kept from the last move, or a new one.
+        """
+        if self.reuseTree and self.root is not None:
+          edge = self.root.edges.get(self.lastAction)
+          if edge is not None:
+            node = edge[2].get(state.key())
+            if node is not None:
+              return node
+        return MonteCarloNode(state)
+
+    def simulate(self, root):
+        """
+          One simulation: selection, expansion, rollout and backup.
+        """
+        node = root
+        path = []
+        while not node.state.isOver():
+          action = self.select(node)
+          edge = node.edges[action]
+          path.append((node, edge))
+          state = self.play(node.state, action)
+          key = state.key()
+          child = edge[2].get(key)
+          if child is None:
+            node = edge[2][key] = MonteCarloNode(state)
+            break
+          node = child
+
+        value = self.rollout(node.state)
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        node.visits += 1
+        for parent, edge in path:
+          parent.visits += 1
+          edge[0] += 1
+          edge[1] += value
+
+    def select(self, node):
+        """
+          An untried action if there is one, else the UCB1 choice.
+        """
+        legalActions = node.state.legalActions(0)
+        untried = [action for action in legalActions if action not in node.edges]
+        if untried:
+          action = self.random.choice(untried)
+          node.edges[action] = [0, 0.0, {}]
+          return action
+        scale = (self.high - self.low) or 1.0
+        logVisits = math.log(node.visits)
+        def ucb(action):
+          visits, total, outcomes = node.edges[action]
+          return (total / visits - self.low) / scale + self.exploration * math.sqrt(logVisits / visits)
+        return max(legalActions, key=ucb)
+
+    def play(self, state, action):
+        """
+          The state after Pacman's action and the ghosts' replies (drawn from the model).
+        """
+        state = state.copy()
+        state.step(0, action)
+        for ghost in range(1, len(state.positions)):
+          if state.isOver():
+            break
+          state.step(ghost, self.ghostAction(state, ghost))
+        return state
+
+    def ghostAction(self, state, ghost):
+        legalActions = state.legalActions(ghost)
+        weights = self.ghostDistribution(state, ghost, legalActions)
+        choice = self.random.random() * sum(weights)
+        for action, weight in zip(legalActions, weights):
+          choice -= weight
+          if choice < 0:
+            return action
+        return legalActions[-1]
+
+    def rollout(self, state):
+        """
+          Plays Pacman at random for rolloutDepth moves and returns the score.
+          Like a ghost, the random Pacman never stops and only turns around
+          at dead ends, so it covers ground instead of dithering in place.
+        """
+        state = state.copy()
+        for move in range(self.rolloutDepth):
+          if state.isOver():
+            break
+          legalActions = [action for action in state.legalActions(0) if action != Directions.STOP] or [Directions.STOP]
+          reverse = Actions.reverseDirection(state.directions[0])
+          if reverse in legalActions and len(legalActions) > 1:
+            legalActions.remove(reverse)
+          state.step(0, self.random.choice(legalActions))
+          for ghost in range(1, len(state.positions)):
+            if state.isOver():
+              break
+            state.step(ghost, self.ghostAction(state, ghost))
+        return state.score
+
 def betterEvaluationFunction(currentGameState):
     """
       Your extreme ghost-hunting, pellet-nabbing, food-gobbling, unstoppable
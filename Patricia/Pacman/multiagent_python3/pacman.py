@@ -43,6 +43,7 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
 from util import nearestPoint
 from util import manhattanDistance
 import util, layout
@@ -71,14 +72,39 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
-    explored = set()
+    # static variable keeps track of the states expanded by generateSuccessor,
+    # as configured by setExploredPolicy (off by default; the autograder turns
+    # the full set on to count the states a search agent explores)
+    exploredPolicy = None
+
+    def setExploredPolicy(name):
+        """
+        Chooses how expanded states are tracked: 'off', 'count' (number of
+        successors generated, no hashing) or 'set' (every distinct state).
+        """
+        if name not in EXPLORED_POLICIES:
+            raise Exception('Unknown explored policy %s, expected one of %s' % (name, sorted(EXPLORED_POLICIES)))
+        GameState.exploredPolicy = EXPLORED_POLICIES[name]()
+    setExploredPolicy = staticmethod(setExploredPolicy)
+
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
-        GameState.explored = set()
-        return tmp
+        """
+        Returns the set of states explored since the last reset (empty unless
+        the 'set' policy is on).
+        """
+        return GameState.exploredPolicy.reset()
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+    def getAndResetExploredCount():
+        """
+        Returns how many states were explored since the last reset: distinct
+        states under 'set', successors generated under 'count', 0 when off.
+        """
+        count = GameState.exploredPolicy.count()
+        GameState.exploredPolicy.reset()
+        return count
+    getAndResetExploredCount = staticmethod(getAndResetExploredCount)
+
     def getLegalActions( self, agentIndex=0 ):
         """
         Returns the legal actions for the agent specified.
@@ -104,6 +130,7 @@ class GameState:
         # Let agent's logic deal with its action's effects on the board
         if agentIndex == 0:  # Pacman is moving
             state.data._eaten = [False for i in range(state.getNumAgents())]
+            state.data._ownsEaten = True
             PacmanRules.applyAction( state, action )
         else:                # A ghost is moving
             GhostRules.applyAction( state, action, agentIndex )
@@ -112,7 +139,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.getMutableAgentState( agentIndex ) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -120,8 +147,7 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        GameState.exploredPolicy.record(self, state)
         return state
 
     def getLegalPacmanActions( self ):
@@ -206,6 +232,13 @@ class GameState:
     def hasWall(self, x, y):
         return self.data.layout.walls[x][y]
 
+    def getMazeDistance(self, pos1, pos2):
+        """
+        Length of the shortest path between two positions through the maze,
+        from a table computed once per layout (see layout.MazeDistances).
+        """
+        return self.data.layout.getMazeDistances().distance(pos1, pos2)
+
     def isLose( self ):
         return self.data._lose
 
@@ -231,6 +264,22 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def pack( self ):
+        """
+        Returns a compact, picklable copy of the state that leaves out the
+        layout, for sending states to other processes (see GameStateData.pack).
+        """
+        return self.data.pack()
+
+    def unpack( layout, packed ):
+        """
+        Rebuilds a state packed with pack() over its layout.
+        """
+        state = GameState()
+        state.data = GameStateData.unpack( layout, packed )
+        return state
+    unpack = staticmethod( unpack )
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -253,6 +302,59 @@ class GameState:
         """
         self.data.initialize(layout, numGhostAgents)
 
+class ExploredOff:
+    """
+    Explored policy that tracks nothing.
+    """
+    def record(self, state, successor):
+        pass
+
+    def count(self):
+        return 0
+
+    def reset(self):
+        return set()
+
+class ExploredCount:
+    """
+    Explored policy that counts the successors generated, without hashing states.
+    """
+    def __init__(self):
+        self.successors = 0
+
+    def record(self, state, successor):
+        self.successors += 1
+
+    def count(self):
+        return self.successors
+
+    def reset(self):
+        self.successors = 0
+        return set()
+
+class ExploredSet:
+    """
+    Explored policy that keeps every distinct state that was expanded or
+    generated (what the autograder counts).
+    """
+    def __init__(self):
+        self.states = set()
+
+    def record(self, state, successor):
+        self.states.add(state)
+        self.states.add(successor)
+
+    def count(self):
+        return len(self.states)
+
+    def reset(self):
+        states = self.states
+        self.states = set()
+        return states
+
+EXPLORED_POLICIES = {'off': ExploredOff, 'count': ExploredCount, 'set': ExploredSet}
+GameState.exploredPolicy = ExploredOff()
+
 ############################################################################
 #                     THE HIDDEN SECRETS OF PACMAN                         #
 #                                                                          #
@@ -277,6 +379,10 @@ class ClassicGameRules:
         initState.initialize( layout, len(ghostAgents) )
         game = Game(agents, display, self, catchExceptions=catchExceptions)
         game.state = initState
+        # Tell agents that search against the clock how long they have per move
+        for agentIndex, agent in enumerate(agents):
+            if 'setMoveTimeout' in dir(agent):
+                agent.setMoveTimeout(self.getMoveTimeout(agentIndex))
         self.initialState = initState.deepCopy()
         self.quiet = quiet
         return game
@@ -342,7 +448,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.getMutableAgentState( 0 )
 
         # Update Configuration
         vector = Actions.directionToVector( action, PacmanRules.PACMAN_SPEED )
@@ -361,8 +467,7 @@ class PacmanRules:
         # Eat food
         if state.data.food[x][y]:
             state.data.scoreChange += 10
-            state.data.food = state.data.food.copy()
-            state.data.food[x][y] = False
+            state.data.removeFood( position )
             state.data._foodEaten = position
             # TODO: cache numFood?
             numFood = state.getNumFood()
@@ -371,11 +476,11 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if( position in state.getCapsules() ):
-            state.data.capsules.remove( position )
+            state.data.removeCapsule( position )
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range( 1, len( state.data.agentStates ) ):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.getMutableAgentState( index ).scaredTimer = SCARED_TIME
     consume = staticmethod( consume )
 
 class GhostRules:
@@ -404,7 +509,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.getMutableAgentState( ghostIndex )
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0: speed /= 2.0
         vector = Actions.directionToVector( action, speed )
@@ -414,7 +519,9 @@ class GhostRules:
     def decrementTimer( ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            # Configurations can be shared between states: replace it instead of moving it
+            configuration = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( configuration.pos ), configuration.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
     decrementTimer = staticmethod( decrementTimer )
 
@@ -435,11 +542,12 @@ class GhostRules:
 
     def collide( state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
+            ghostState = state.data.getMutableAgentState( agentIndex )
             state.data.scoreChange += 200
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
             # Added for first-person
-            state.data._eaten[agentIndex] = True
+            state.data.getMutableEaten()[agentIndex] = True
         else:
             if not state.data._win:
                 state.data.scoreChange -= 500
@@ -523,6 +631,8 @@ def readCommand( argv ):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--explored', dest='explored', type='choice', choices=sorted(EXPLORED_POLICIES),
+                      help=default('How to track the states explored by search agents: off, count or set'), default='off')
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -570,6 +680,7 @@ def readCommand( argv ):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['exploredPolicy'] = options.explored
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -625,10 +736,14 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30, exploredPolicy=None ):
     import __main__
     __main__.__dict__['_display'] = display
 
+    # None keeps the policy already set (e.g. by the autograder's agents)
+    if exploredPolicy != None:
+        GameState.setExploredPolicy(exploredPolicy)
+
     rules = ClassicGameRules(timeout)
     games = []
 
@@ -17,6 +17,7 @@ import signal
 import sys
 import inspect
 import heapq
+import collections
 import random
 from io import StringIO
 
@@ -214,6 +215,69 @@ class PriorityQueueWithFunction(PriorityQueue):
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
 
+class TranspositionTable:
+    """
+      Bounded cache of search results for game-tree search.  Entries are keyed
+      on (state hash, remaining depth, agent index) and hold the value, its
+      bound type (EXACT, LOWER or UPPER, for alpha-beta windows) and the best
+      action found.
+
+      At most maxEntries entries are kept.  Storing under a key that is already
+      present replaces the entry; when the table is full the least recently
+      used entry is evicted.  Each entry costs roughly 300 bytes, so the
+      default of 100000 entries stays around 30MB.
+    """
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    def __init__(self, maxEntries=100000):
+        self.maxEntries = max(1, int(maxEntries))
+        self.entries = collections.OrderedDict()
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, state, depth, agentIndex):
+        return (hash(state), depth, agentIndex)
+
+    def lookup(self, key):
+        "Returns the (value, bound, action) stored under key, or None"
+        self.probes += 1
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key, value, bound, action):
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.maxEntries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = (value, bound, action)
+        self.stores += 1
+
+    def hitRate(self):
+        if self.probes == 0: return 0.0
+        return float(self.hits) / self.probes
+
+    def __str__(self):
+        return 'entries=%d probes=%d hits=%d (%.1f%%) stores=%d evictions=%d' % (
+            len(self.entries), self.probes, self.hits, 100 * self.hitRate(), self.stores, self.evictions)
+
 def manhattanDistance(xy1, xy2):
     "Returns the Manhattan distance between points xy1 and xy2"
     return abs(xy1[0] - xy2[0]) + abs(xy1[1] - xy2[1])